@@ -0,0 +1,12 @@
+import pytest
+from django.test import override_settings
+
+from core.test_runner import get_test_settings
+
+
+@pytest.fixture(autouse=True, scope='session')
+def test_settings(tmp_path_factory):
+    """Те же настройки, что дают тесты manage.py test"""
+    directory = tmp_path_factory.mktemp('yatube')
+    with override_settings(**get_test_settings(str(directory))):
+        yield
@@ -0,0 +1,245 @@
+import glob
+import json
+import os
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_STATS_INTERVAL = 10
+STATS_FIELDS = ('hits', 'misses', 'sets', 'evictions', 'bytes')
+PREFIX_SEPARATOR = re.compile(r'[:|]')
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_prefix(key):
+    """Префикс ключа для статистики: часть до первого ':' или '|'"""
+    return PREFIX_SEPARATOR.split(key, 1)[0] or key
+
+
+class _Store:
+    """Общие для всех потоков процесса данные одного кеша"""
+
+    def __init__(self):
+        self.data = OrderedDict()
+        self.bytes = 0
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.stats_saved_at = 0
+
+
+class LRUCache(BaseCache):
+    """Кеш в памяти процесса с вытеснением давно не использованных записей.
+
+    Объём ограничен суммой байт сериализованных значений (MAX_BYTES), а не
+    числом ключей. Попадания, промахи, записи, вытеснения и занятые байты
+    считаются по префиксу ключа. Если задан STATS_DIR, статистика процесса
+    раз в STATS_INTERVAL секунд сохраняется туда для команды cache_stats.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location or 'default'
+        self.max_bytes = int(options.get('MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.stats_dir = options.get('STATS_DIR')
+        self.stats_interval = options.get(
+            'STATS_INTERVAL',
+            DEFAULT_STATS_INTERVAL,
+        )
+        with _stores_lock:
+            self._store = _stores.setdefault(self.location, _Store())
+
+    def _count(self, prefix, field, value=1):
+        stats = self._store.stats.get(prefix)
+        if stats is None:
+            stats = self._store.stats[prefix] = dict.fromkeys(STATS_FIELDS, 0)
+        stats[field] += value
+
+    def _has_expired(self, item):
+        return item[1] is not None and item[1] <= time.time()
+
+    def _delete(self, key):
+        pickled, _, prefix = self._store.data.pop(key)
+        self._store.bytes -= len(pickled)
+        self._count(prefix, 'bytes', -len(pickled))
+
+    def _set(self, key, pickled, expiry, prefix):
+        if key in self._store.data:
+            self._delete(key)
+        if len(pickled) > self.max_bytes:
+            return
+        self._store.data[key] = (pickled, expiry, prefix)
+        self._store.bytes += len(pickled)
+        self._count(prefix, 'sets')
+        self._count(prefix, 'bytes', len(pickled))
+        while self._store.bytes > self.max_bytes:
+            oldest_key = next(iter(self._store.data))
+            self._count(self._store.data[oldest_key][2], 'evictions')
+            self._delete(oldest_key)
+
+    def _get_alive(self, key):
+        item = self._store.data.get(key)
+        if item is not None and self._has_expired(item):
+            self._delete(key)
+            item = None
+
+        return item
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        prefix = get_prefix(key)
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._store.lock:
+            if self._get_alive(key) is not None:
+                return False
+            self._set(
+                key,
+                pickled,
+                self.get_backend_timeout(timeout),
+                prefix,
+            )
+        self._save_stats()
+
+        return True
+
+    def get(self, key, default=None, version=None):
+        prefix = get_prefix(key)
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            item = self._get_alive(key)
+            if item is None:
+                self._count(prefix, 'misses')
+            else:
+                self._count(prefix, 'hits')
+                self._store.data.move_to_end(key)
+        self._save_stats()
+        if item is None:
+            return default
+
+        return pickle.loads(item[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        prefix = get_prefix(key)
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._store.lock:
+            self._set(
+                key,
+                pickled,
+                self.get_backend_timeout(timeout),
+                prefix,
+            )
+        self._save_stats()
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            item = self._get_alive(key)
+            if item is None:
+                return False
+            self._store.data[key] = (
+                item[0],
+                self.get_backend_timeout(timeout),
+                item[2],
+            )
+
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        prefix = get_prefix(key)
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            item = self._get_alive(key)
+            if item is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(item[0]) + delta
+            self._set(
+                key,
+                pickle.dumps(value, self.pickle_protocol),
+                item[1],
+                prefix,
+            )
+
+        return value
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            return self._get_alive(key) is not None
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._store.lock:
+            if key in self._store.data:
+                self._delete(key)
+
+    def discard(self, keys):
+        """Удаление записей по уже построенным ключам"""
+        with self._store.lock:
+            for key in keys:
+                if key in self._store.data:
+                    self._delete(key)
+
+    def clear(self):
+        with self._store.lock:
+            self._store.data.clear()
+            self._store.bytes = 0
+            for stats in self._store.stats.values():
+                stats['bytes'] = 0
+
+    def get_stats(self):
+        """Снимок статистики кеша в этом процессе"""
+        with self._store.lock:
+            return {
+                'location': self.location,
+                'pid': os.getpid(),
+                'max_bytes': self.max_bytes,
+                'bytes': self._store.bytes,
+                'keys': len(self._store.data),
+                'prefixes': {
+                    prefix: dict(stats)
+                    for prefix, stats in self._store.stats.items()
+                },
+            }
+
+    def get_stats_files(self):
+        """Снимки статистики всех процессов с этим кешем"""
+        if not self.stats_dir:
+            return []
+
+        return glob.glob(
+            os.path.join(self.stats_dir, f'{self.location}-*.json')
+        )
+
+    def _save_stats(self):
+        now = time.monotonic()
+        if (
+            not self.stats_dir
+            or now - self._store.stats_saved_at < self.stats_interval
+        ):
+            return
+        self._store.stats_saved_at = now
+        os.makedirs(self.stats_dir, exist_ok=True)
+        path = os.path.join(
+            self.stats_dir,
+            f'{self.location}-{os.getpid()}.json',
+        )
+        with open(f'{path}.tmp', 'w') as stats_file:
+            json.dump(self.get_stats(), stats_file)
+        os.replace(f'{path}.tmp', path)
@@ -0,0 +1,340 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+DEFAULT_BUSY_TIMEOUT = 5
+DEFAULT_CULL_INTERVAL = 100
+MAX_QUERY_KEYS = 500
+INVALIDATION_LOG_SIZE = 10000
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_entry ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL'
+    ')',
+    'CREATE INDEX IF NOT EXISTS cache_entry_expires_idx'
+    ' ON cache_entry (expires)',
+    'CREATE TABLE IF NOT EXISTS cache_invalidation ('
+    ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+    ' key TEXT'
+    ')',
+)
+
+
+class SQLiteCache(BaseCache):
+    """Кеш в файле SQLite, общий для всех процессов одной машины.
+
+    LOCATION — путь к файлу базы. Файл работает в режиме WAL, поэтому
+    чтения не блокируются записью из других процессов. Каждое изменение
+    записи попадает в журнал cache_invalidation: по нему TieredCache
+    узнаёт, какие ключи устарели в памяти процесса. Лишние записи
+    удаляются раз в CULL_INTERVAL записей всех процессов, поэтому
+    MAX_ENTRIES - мягкий предел.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.busy_timeout = options.get('BUSY_TIMEOUT', DEFAULT_BUSY_TIMEOUT)
+        self.cull_interval = options.get(
+            'CULL_INTERVAL',
+            DEFAULT_CULL_INTERVAL,
+        )
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+
+        return connection
+
+    def _write(self, statements):
+        """Выполнение запросов в одной транзакции с записью в журнал"""
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = statements(connection)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        return result
+
+    def _log(self, connection, key):
+        seq = connection.execute(
+            'INSERT INTO cache_invalidation (key) VALUES (?)',
+            (key,),
+        ).lastrowid
+        if seq % INVALIDATION_LOG_SIZE == 0:
+            connection.execute(
+                'DELETE FROM cache_invalidation WHERE seq <= ?',
+                (seq - INVALIDATION_LOG_SIZE,),
+            )
+
+        return seq
+
+    def _cull(self, connection):
+        if not self._max_entries:
+            return
+        connection.execute(
+            'DELETE FROM cache_entry WHERE expires <= ?',
+            (time.time(),),
+        )
+        count = connection.execute(
+            'SELECT COUNT(*) FROM cache_entry',
+        ).fetchone()[0]
+        if count <= self._max_entries:
+            return
+        # Как и DatabaseCache, удаляем долю записей, истекающих раньше
+        # других. Журнал не пишем: в памяти процессов они могут жить до
+        # своего срока, значение у них по-прежнему верное.
+        connection.execute(
+            'DELETE FROM cache_entry WHERE key IN ('
+            ' SELECT key FROM cache_entry'
+            ' ORDER BY expires IS NULL, expires LIMIT ?'
+            ')',
+            (count // self._cull_frequency or 1,),
+        )
+
+    def _store(self, connection, key, value, expires, mode):
+        if mode == 'add':
+            row = connection.execute(
+                'SELECT expires FROM cache_entry WHERE key = ?',
+                (key,),
+            ).fetchone()
+            if row is not None and (row[0] is None or row[0] > time.time()):
+                return False
+        connection.execute(
+            'INSERT OR REPLACE INTO cache_entry (key, value, expires)'
+            ' VALUES (?, ?, ?)',
+            (key, pickle.dumps(value, self.pickle_protocol), expires),
+        )
+        # Номер в журнале общий для всех процессов: подсчёт записей и
+        # удаление лишних идут не на каждую запись, а раз в интервал.
+        if self._log(connection, key) % self.cull_interval == 0:
+            self._cull(connection)
+
+        return True
+
+    def get_entry(self, key):
+        """Значение и время истечения записи по готовому ключу"""
+        row = self._connection.execute(
+            'SELECT value, expires FROM cache_entry WHERE key = ?',
+            (key,),
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+
+        return pickle.loads(row[0]), row[1]
+
+    def set_entry(self, key, value, expires, mode='set'):
+        """Запись по готовому ключу; mode='add' не перезаписывает живую"""
+        return self._write(
+            lambda connection: self._store(
+                connection, key, value, expires, mode,
+            )
+        )
+
+    def get_entries(self, keys):
+        """Значения и время истечения живых записей по готовым ключам"""
+        keys = list(keys)
+        now = time.time()
+        entries = {}
+        for start in range(0, len(keys), MAX_QUERY_KEYS):
+            chunk = keys[start:start + MAX_QUERY_KEYS]
+            rows = self._connection.execute(
+                'SELECT key, value, expires FROM cache_entry'
+                f' WHERE key IN ({", ".join("?" * len(chunk))})',
+                chunk,
+            ).fetchall()
+            for key, value, expires in rows:
+                if expires is None or expires > now:
+                    entries[key] = (pickle.loads(value), expires)
+
+        return entries
+
+    def set_entries(self, entries, expires):
+        """Записи по готовым ключам в одной транзакции"""
+        def statements(connection):
+            for key, value in entries.items():
+                self._store(connection, key, value, expires, 'set')
+
+        self._write(statements)
+
+    def delete_entries(self, keys):
+        """Удаление записей по готовым ключам в одной транзакции"""
+        keys = list(keys)
+
+        def statements(connection):
+            for start in range(0, len(keys), MAX_QUERY_KEYS):
+                chunk = keys[start:start + MAX_QUERY_KEYS]
+                connection.execute(
+                    'DELETE FROM cache_entry'
+                    f' WHERE key IN ({", ".join("?" * len(chunk))})',
+                    chunk,
+                )
+            for key in keys:
+                self._log(connection, key)
+
+        self._write(statements)
+
+    def incr_entry(self, key, delta):
+        """Атомарное увеличение числа по готовому ключу"""
+        def statements(connection):
+            row = connection.execute(
+                'SELECT value, expires FROM cache_entry WHERE key = ?',
+                (key,),
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            self._store(connection, key, value, row[1], 'set')
+
+            return value, row[1]
+
+        return self._write(statements)
+
+    def get_invalidations(self, after):
+        """Ключи, изменённые после записи журнала с номером after.
+
+        Возвращает номер последней записи и список ключей; None вместо
+        списка значит, что журнал уже обрезан или кеш очищали, и верить
+        памяти процесса больше нельзя.
+        """
+        rows = self._connection.execute(
+            'SELECT seq, key FROM cache_invalidation WHERE seq > ?'
+            ' ORDER BY seq',
+            (after,),
+        ).fetchall()
+        if not rows:
+            return after, []
+        keys = [key for _, key in rows]
+        if rows[0][0] != after + 1 or None in keys:
+            return rows[-1][0], None
+
+        return rows[-1][0], keys
+
+    def get_last_invalidation(self):
+        return self._connection.execute(
+            'SELECT COALESCE(MAX(seq), 0) FROM cache_invalidation',
+        ).fetchone()[0]
+
+    def make_keys(self, keys, version=None):
+        """Готовые ключи с исходными: {готовый ключ: ключ}"""
+        made_keys = {}
+        for key in keys:
+            made_key = self.make_key(key, version=version)
+            self.validate_key(made_key)
+            made_keys[made_key] = key
+
+        return made_keys
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        return self.set_entry(
+            key, value, self.get_backend_timeout(timeout), 'add',
+        )
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        entry = self.get_entry(key)
+
+        return default if entry is None else entry[0]
+
+    def get_many(self, keys, version=None):
+        made_keys = self.make_keys(keys, version=version)
+
+        return {
+            made_keys[made_key]: value
+            for made_key, (value, _) in self.get_entries(made_keys).items()
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self.set_entry(key, value, self.get_backend_timeout(timeout))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        made_keys = self.make_keys(data, version=version)
+        self.set_entries(
+            {made_key: data[key] for made_key, key in made_keys.items()},
+            self.get_backend_timeout(timeout),
+        )
+
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        entry = self.get_entry(key)
+        if entry is None:
+            return False
+        self.set_entry(key, entry[0], self.get_backend_timeout(timeout))
+
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        return self.incr_entry(key, delta)[0]
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        return self.get_entry(key) is not None
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        def statements(connection):
+            connection.execute(
+                'DELETE FROM cache_entry WHERE key = ?',
+                (key,),
+            )
+            self._log(connection, key)
+
+        self._write(statements)
+
+    def delete_many(self, keys, version=None):
+        self.delete_entries(self.make_keys(keys, version=version))
+
+    def clear(self):
+        def statements(connection):
+            connection.execute('DELETE FROM cache_entry')
+            self._log(connection, None)
+
+        self._write(statements)
+
+    def close(self, **kwargs):
+        # Соединение живёт всё время работы потока: открывать файл и
+        # проверять схему на каждый запрос дороже, чем держать его.
+        pass
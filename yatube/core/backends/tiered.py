@@ -0,0 +1,205 @@
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.signals import request_started
+
+from .lru import LRUCache
+from .sqlite import SQLiteCache
+
+DEFAULT_L1_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_SYNC_INTERVAL = 1
+MISSING = object()
+
+_sync_states = {}
+_sync_states_lock = threading.Lock()
+
+
+class _SyncState:
+    """Докуда процесс прочитал журнал изменений общего кеша"""
+
+    def __init__(self):
+        self.seq = None
+        self.synced_at = 0
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.lock = threading.Lock()
+
+
+def expire_syncs(**kwargs):
+    """Сверка с журналом в начале каждого запроса"""
+    for state in _sync_states.values():
+        state.synced_at = 0
+
+
+request_started.connect(expire_syncs)
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кеш: LRU в памяти процесса поверх общего SQLite.
+
+    Записи сразу уходят в общий файл, поэтому их видят все процессы.
+    Чтение сначала идёт в память процесса (L1). Перед чтением процесс
+    сверяется с журналом изменений SQLite (в начале каждого запроса и
+    не реже раза в SYNC_INTERVAL секунд) и выбрасывает из L1 ключи,
+    которые кто-то изменил или удалил.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.sync_interval = options.get(
+            'SYNC_INTERVAL',
+            DEFAULT_SYNC_INTERVAL,
+        )
+        self._l2 = SQLiteCache(location, params)
+        l1_location = options.get('L1_LOCATION', 'l1')
+        self._l1 = LRUCache(l1_location, {
+            **params,
+            'OPTIONS': {
+                'MAX_BYTES': options.get(
+                    'L1_MAX_BYTES',
+                    DEFAULT_L1_MAX_BYTES,
+                ),
+                'STATS_DIR': options.get('STATS_DIR'),
+            },
+        })
+        with _sync_states_lock:
+            self._state = _sync_states.setdefault(l1_location, _SyncState())
+
+    def _sync(self):
+        state = self._state
+        now = time.monotonic()
+        if now - state.synced_at < self.sync_interval:
+            return
+        with state.lock:
+            if state.seq is None:
+                state.seq = self._l2.get_last_invalidation()
+                self._l1.clear()
+            else:
+                state.seq, keys = self._l2.get_invalidations(state.seq)
+                if keys is None:
+                    self._l1.clear()
+                else:
+                    self._l1.discard(keys)
+            state.synced_at = now
+
+    def _fill_l1(self, key, value, expires, version):
+        if expires is None:
+            self._l1.set(key, value, None, version=version)
+            return
+        timeout = expires - time.time()
+        if timeout > 0:
+            self._l1.set(key, value, timeout, version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        expires = self.get_backend_timeout(timeout)
+        added = self._l2.set_entry(made_key, value, expires, 'add')
+        if added:
+            self._fill_l1(key, value, expires, version)
+
+        return added
+
+    def get(self, key, default=None, version=None):
+        self._sync()
+        value = self._l1.get(key, MISSING, version=version)
+        if value is not MISSING:
+            return value
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        entry = self._l2.get_entry(made_key)
+        if entry is None:
+            self._state.l2_misses += 1
+            return default
+        self._state.l2_hits += 1
+        self._fill_l1(key, *entry, version)
+
+        return entry[0]
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._l1.get(key, MISSING, version=version)
+            if value is MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if not missing:
+            return found
+        made_keys = self._l2.make_keys(missing, version=version)
+        entries = self._l2.get_entries(made_keys)
+        self._state.l2_hits += len(entries)
+        self._state.l2_misses += len(missing) - len(entries)
+        for made_key, (value, expires) in entries.items():
+            key = made_keys[made_key]
+            self._fill_l1(key, value, expires, version)
+            found[key] = value
+
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        expires = self.get_backend_timeout(timeout)
+        self._l2.set_entry(made_key, value, expires)
+        self._fill_l1(key, value, expires, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        made_keys = self._l2.make_keys(data, version=version)
+        expires = self.get_backend_timeout(timeout)
+        self._l2.set_entries(
+            {made_key: data[key] for made_key, key in made_keys.items()},
+            expires,
+        )
+        for key, value in data.items():
+            self._fill_l1(key, value, expires, version)
+
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1.delete(key, version=version)
+
+        return self._l2.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        value, expires = self._l2.incr_entry(made_key, delta)
+        self._fill_l1(key, value, expires, version)
+
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version=version) is not MISSING
+
+    def delete(self, key, version=None):
+        self._l2.delete(key, version=version)
+        self._l1.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self._l2.delete_many(keys, version=version)
+        for key in keys:
+            self._l1.delete(key, version=version)
+
+    def clear(self):
+        self._l2.clear()
+        self._l1.clear()
+
+    def get_stats(self):
+        """Статистика L1 этого процесса и обращений к общему L2"""
+        stats = self._l1.get_stats()
+        stats['l2'] = {
+            'path': self._l2.path,
+            'hits': self._state.l2_hits,
+            'misses': self._state.l2_misses,
+        }
+
+        return stats
+
+    def get_stats_files(self):
+        return self._l1.get_stats_files()
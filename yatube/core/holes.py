@@ -0,0 +1,70 @@
+import json
+import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.template.loader import render_to_string
+
+MARKER = '<!--hole:{}-->'
+MARKER_RE = re.compile(r'<!--hole:([A-Za-z0-9_=-]+)-->')
+
+_holes = {}
+
+
+def register(name, template_name):
+    """Регистрирует дырку: шаблон и функцию его контекста.
+
+    Функция получает запрос и аргументы тега {% hole %} и возвращает
+    контекст шаблона для текущего пользователя.
+    """
+    def decorator(get_context):
+        _holes[name] = (template_name, get_context)
+        return get_context
+
+    return decorator
+
+
+@register('header', 'includes/header.html')
+def header(request):
+    return {}
+
+
+def render_hole(request, name, kwargs):
+    """HTML дырки для пользователя запроса"""
+    template_name, get_context = _holes[name]
+
+    return render_to_string(
+        template_name,
+        get_context(request, **kwargs),
+        request,
+    )
+
+
+def defer_holes(request):
+    """Дырки запроса будут метками, а не готовым HTML"""
+    request.defer_holes = True
+
+
+def make_marker(name, kwargs):
+    data = json.dumps([name, kwargs], separators=(',', ':')).encode()
+
+    return MARKER.format(urlsafe_b64encode(data).decode())
+
+
+def fill_holes(request, response):
+    """Заполняет метки в ответе HTML для пользователя запроса"""
+    if response.streaming or 'text/html' not in response.get(
+        'Content-Type',
+        '',
+    ):
+        return response
+
+    def render_marker(match):
+        name, kwargs = json.loads(urlsafe_b64decode(match.group(1)))
+        return render_hole(request, name, kwargs)
+
+    response.content = MARKER_RE.sub(
+        render_marker,
+        response.content.decode(response.charset),
+    )
+
+    return response
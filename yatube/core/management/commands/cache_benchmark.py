@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'sqlite': 'core.backends.sqlite.SQLiteCache',
+    'tiered': 'core.backends.tiered.TieredCache',
+}
+PAYLOAD_SIZE = 20 * 1024
+
+
+def run_worker(args):
+    """Поток запросов одного воркера к кешу: чтение, при промахе запись"""
+    backend, location, keys, requests, invalidate_every, seed = args
+    cache = import_string(BACKENDS[backend])(location, {
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 10 * keys},
+    })
+    generator = random.Random(seed)
+    weights = [1 / rank for rank in range(1, keys + 1)]
+    payload = os.urandom(PAYLOAD_SIZE)
+    hits = 0
+    started = time.perf_counter()
+    for number, key in enumerate(
+        generator.choices(range(keys), weights, k=requests), start=1,
+    ):
+        if cache.get(f'page:{key}') is None:
+            cache.set(f'page:{key}', payload)
+        else:
+            hits += 1
+        if invalidate_every and number % invalidate_every == 0:
+            cache.delete(f'page:{generator.randrange(keys)}')
+
+    return hits, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    """Сравнение бэкендов кеша при нескольких процессах-воркерах"""
+
+    help = 'Меряет долю попаданий и скорость кеша для нескольких воркеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--keys', type=int, default=500)
+        parser.add_argument(
+            '--invalidate-every',
+            type=int,
+            default=100,
+            help='Каждый N-й запрос воркера удаляет случайный ключ',
+        )
+        parser.add_argument(
+            '--backend',
+            action='append',
+            choices=sorted(BACKENDS),
+            help='Бэкенд для сравнения, по умолчанию все',
+        )
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        for backend in options['backend'] or list(BACKENDS):
+            with tempfile.TemporaryDirectory() as directory:
+                location = os.path.join(directory, 'cache.sqlite3')
+                jobs = [
+                    (
+                        backend,
+                        location,
+                        options['keys'],
+                        options['requests'],
+                        options['invalidate_every'],
+                        worker,
+                    )
+                    for worker in range(options['workers'])
+                ]
+                with context.Pool(options['workers']) as pool:
+                    results = pool.map(run_worker, jobs)
+            total = options['workers'] * options['requests']
+            hits = sum(worker_hits for worker_hits, _ in results)
+            elapsed = max(seconds for _, seconds in results)
+            self.stdout.write(
+                f'{backend}: hit ratio={hits / total:.2%} '
+                f'ops/s={total / elapsed:.0f}'
+            )
@@ -0,0 +1,45 @@
+import json
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from core.backends.lru import STATS_FIELDS
+
+
+class Command(BaseCommand):
+    """Вывод статистики LRU-кеша, собранной со всех процессов"""
+
+    help = 'Показывает попадания, промахи и вытеснения кеша по префиксам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cache',
+            default='default',
+            help='Алиас кеша из settings.CACHES',
+        )
+
+    def handle(self, *args, **options):
+        cache = caches[options['cache']]
+        if not hasattr(cache, 'get_stats_files'):
+            raise CommandError('Бэкенд кеша не ведёт статистику')
+        totals = {}
+        snapshots = cache.get_stats_files()
+        for path in snapshots:
+            with open(path) as stats_file:
+                snapshot = json.load(stats_file)
+            for prefix, stats in snapshot['prefixes'].items():
+                total = totals.setdefault(
+                    prefix,
+                    dict.fromkeys(STATS_FIELDS, 0),
+                )
+                for field in STATS_FIELDS:
+                    total[field] += stats[field]
+        self.stdout.write(f'Процессов: {len(snapshots)}')
+        for prefix, total in sorted(totals.items()):
+            lookups = total['hits'] + total['misses']
+            ratio = total['hits'] / lookups if lookups else 0
+            self.stdout.write(
+                f'{prefix}: hits={total["hits"]} misses={total["misses"]} '
+                f'ratio={ratio:.2%} evictions={total["evictions"]} '
+                f'bytes={total["bytes"]}'
+            )
@@ -0,0 +1,20 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..holes import make_marker, render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **kwargs):
+    """Часть страницы, своя для каждого пользователя.
+
+    В закешированной странице на её месте остаётся метка, которую
+    заполняют при каждой выдаче; без кеша HTML рендерится сразу.
+    """
+    request = context.get('request')
+    if getattr(request, 'defer_holes', False):
+        return mark_safe(make_marker(name, kwargs))
+
+    return mark_safe(render_hole(request, name, kwargs))
@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+def get_test_settings(directory):
+    """Настройки тестов: общий кеш в своём каталоге прогона.
+
+    Миниатюры строятся без пула потоков, сразу после коммита: фоновые
+    потоки пережили бы тест и его MEDIA_ROOT. Счётчики posts.metrics
+    пишутся в кеш сразу, чтобы cache.clear() в тесте сбрасывал и их.
+    """
+    cache = settings.CACHES['default']
+
+    return {
+        'CACHES': {
+            **settings.CACHES,
+            'default': {
+                **cache,
+                'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+                'OPTIONS': {
+                    **cache.get('OPTIONS', {}),
+                    'STATS_DIR': os.path.join(directory, 'stats'),
+                },
+            },
+        },
+        'POSTS_THUMBNAIL_WORKERS': 0,
+        'POSTS_METRICS_FLUSH_INTERVAL': 0,
+    }
+
+
+class TestRunner(DiscoverRunner):
+    """Запуск тестов с настройками get_test_settings"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_directory = tempfile.mkdtemp(prefix='yatube-tests-')
+        self.test_settings = override_settings(
+            **get_test_settings(self.test_directory),
+        )
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        shutil.rmtree(self.test_directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,229 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from ..backends import tiered
+from ..backends.lru import LRUCache, _stores
+from ..backends.sqlite import SQLiteCache
+from ..backends.tiered import TieredCache
+
+User = get_user_model()
+
+
+class LRUCacheTests(SimpleTestCase):
+    """Проверка LRU-бэкенда кеша"""
+
+    def setUp(self):
+        self.stats_dir = tempfile.mkdtemp()
+        self.cache = LRUCache('lru-tests', {
+            'OPTIONS': {
+                'MAX_BYTES': 200,
+                'STATS_DIR': self.stats_dir,
+                'STATS_INTERVAL': 0,
+            },
+        })
+
+    def tearDown(self):
+        _stores.pop('lru-tests', None)
+
+    def test_least_recently_used_key_is_evicted(self):
+        """Вытесняется ключ, к которому дольше всего не обращались"""
+        self.cache.set('page:1', 'x' * 80)
+        self.cache.set('page:2', 'x' * 80)
+        self.cache.get('page:1')
+        self.cache.set('page:3', 'x' * 80)
+        self.assertIsNotNone(self.cache.get('page:1'))
+        self.assertIsNone(self.cache.get('page:2'))
+        self.assertIsNotNone(self.cache.get('page:3'))
+
+    def test_size_is_bounded_by_bytes(self):
+        """Объём кеша ограничен байтами, а не числом ключей"""
+        for number in range(20):
+            self.cache.set(f'page:{number}', number)
+        self.assertLessEqual(self.cache.get_stats()['bytes'], 200)
+        self.cache.set('huge', 'x' * 800)
+        self.assertIsNone(self.cache.get('huge'))
+        self.assertIsNotNone(self.cache.get('page:19'))
+
+    def test_cache_api(self):
+        """add, incr, delete и истечение работают как у других бэкендов"""
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.delete('counter')
+        self.assertFalse(self.cache.has_key('counter'))
+        self.cache.set('expired', 1, timeout=-1)
+        self.assertIsNone(self.cache.get('expired'))
+        self.assertEqual(self.cache.get_stats()['bytes'], 0)
+
+    def test_stats_are_kept_per_prefix(self):
+        """Попадания, промахи и вытеснения считаются по префиксу ключа"""
+        self.cache.set('sorl-thumbnail||image||abc', 'x' * 150)
+        self.cache.get('sorl-thumbnail||image||abc')
+        self.cache.get('feed:missing')
+        self.cache.set('feed:page', 'x' * 150)
+        prefixes = self.cache.get_stats()['prefixes']
+        self.assertEqual(prefixes['sorl-thumbnail']['hits'], 1)
+        self.assertEqual(prefixes['sorl-thumbnail']['evictions'], 1)
+        self.assertEqual(prefixes['sorl-thumbnail']['bytes'], 0)
+        self.assertEqual(prefixes['feed']['misses'], 1)
+        self.assertEqual(prefixes['feed']['sets'], 1)
+
+    def test_stats_are_saved_for_command(self):
+        """Снимок статистики сохраняется и читается командой"""
+        self.cache.get('feed:missing')
+        path = os.path.join(self.stats_dir, f'lru-tests-{os.getpid()}.json')
+        with open(path) as stats_file:
+            self.assertEqual(
+                json.load(stats_file)['prefixes']['feed']['misses'],
+                1,
+            )
+        caches = {'lru': {
+            'BACKEND': 'core.backends.lru.LRUCache',
+            'LOCATION': 'lru-tests',
+            'OPTIONS': {'STATS_DIR': self.stats_dir},
+        }}
+        out = StringIO()
+        with self.settings(CACHES=caches):
+            call_command('cache_stats', cache='lru', stdout=out)
+        self.assertIn('feed: hits=0 misses=1', out.getvalue())
+
+
+class SharedCacheTests(SimpleTestCase):
+    """Проверка общего кеша SQLite и кеша с L1 в памяти процесса"""
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'cache.sqlite3')
+
+    def tearDown(self):
+        for location in ('worker-1', 'worker-2'):
+            _stores.pop(location, None)
+            tiered._sync_states.pop(location, None)
+
+    def make_worker(self, location):
+        """Кеш так, как его видит отдельный процесс-воркер"""
+        return TieredCache(self.path, {
+            'OPTIONS': {'L1_LOCATION': location, 'SYNC_INTERVAL': 60},
+        })
+
+    def test_sqlite_cache_api(self):
+        """SQLite-бэкенд поддерживает обычный API кеша"""
+        cache = SQLiteCache(self.path, {})
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertFalse(cache.add('key', 2))
+        self.assertTrue(cache.add('counter', 1))
+        self.assertEqual(cache.incr('counter', 5), 6)
+        cache.set('expired', 1, timeout=-1)
+        self.assertFalse(cache.has_key('expired'))
+        cache.delete('key')
+        self.assertIsNone(cache.get('key'))
+
+    def test_many_keys_in_one_query(self):
+        """get_many, set_many и delete_many работают с пачкой ключей"""
+        caches = (SQLiteCache(self.path, {}), self.make_worker('worker-1'))
+        for cache in caches:
+            with self.subTest(cache=type(cache).__name__):
+                self.assertEqual(cache.set_many({'a': 1, 'b': 2}), [])
+                self.assertEqual(cache.get_many(['a', 'b', 'c']), {
+                    'a': 1,
+                    'b': 2,
+                })
+                cache.delete_many(['a', 'c'])
+                self.assertEqual(cache.get_many(['a', 'b']), {'b': 2})
+                cache.clear()
+
+    def test_tiered_get_many_fills_l1(self):
+        """Ключи, найденные в общем кеше, попадают в память воркера"""
+        self.make_worker('worker-1').set_many({'a': 1, 'b': 2})
+        second = self.make_worker('worker-2')
+        self.assertEqual(second.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+        self.assertEqual(second.get_stats()['l2']['hits'], 2)
+        self.assertEqual(second.get_stats()['l2']['misses'], 1)
+        self.assertEqual(second.get_many(['a', 'b']), {'a': 1, 'b': 2})
+        self.assertEqual(second.get_stats()['l2']['hits'], 2)
+
+    def test_cull_runs_every_interval(self):
+        """Лишние записи удаляются не на каждой записи, а раз в интервал"""
+        cache = SQLiteCache(self.path, {
+            'OPTIONS': {
+                'MAX_ENTRIES': 4,
+                'CULL_FREQUENCY': 2,
+                'CULL_INTERVAL': 10,
+            },
+        })
+        for number in range(9):
+            cache.set(f'key:{number}', number)
+        self.assertEqual(len(cache.get_many(f'key:{n}' for n in range(9))), 9)
+        cache.set('key:9', 9)
+        self.assertEqual(
+            len(cache.get_many(f'key:{n}' for n in range(10))),
+            5,
+        )
+
+    def test_entries_are_shared_between_workers(self):
+        """Запись одного воркера видна другому"""
+        first = self.make_worker('worker-1')
+        second = self.make_worker('worker-2')
+        first.set('feed:index', 'page')
+        self.assertEqual(second.get('feed:index'), 'page')
+        self.assertEqual(second.get_stats()['l2']['hits'], 1)
+
+    def test_invalidation_reaches_other_workers(self):
+        """Удаление ключа в одном воркере сбрасывает его L1 в другом"""
+        first = self.make_worker('worker-1')
+        second = self.make_worker('worker-2')
+        first.set('feed:index', 'old')
+        self.assertEqual(second.get('feed:index'), 'old')
+        first.delete('feed:index')
+        first.set('gen:index', 'new')
+        self.assertEqual(second.get('feed:index'), 'old')
+        tiered.expire_syncs()
+        self.assertIsNone(second.get('feed:index'))
+        self.assertEqual(second.get('gen:index'), 'new')
+
+    def test_clear_reaches_other_workers(self):
+        """Очистка кеша в одном воркере очищает L1 остальных"""
+        first = self.make_worker('worker-1')
+        second = self.make_worker('worker-2')
+        first.set('feed:index', 'page')
+        second.get('feed:index')
+        first.clear()
+        tiered.expire_syncs()
+        self.assertIsNone(second.get('feed:index'))
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command(
+            'cache_benchmark',
+            workers=2,
+            requests=200,
+            keys=20,
+            stdout=out,
+        )
+        for backend in ('locmem', 'sqlite', 'tiered'):
+            self.assertIn(f'{backend}: hit ratio=', out.getvalue())
+
+
+class CacheStatsViewTests(TestCase):
+    """Проверка страницы статистики кеша"""
+
+    def test_only_staff_can_see_stats(self):
+        user = User.objects.create_user(username='user')
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        client = Client()
+        client.force_login(user)
+        response = client.get(reverse('cache_stats'))
+        self.assertEqual(response.status_code, 302)
+        client.force_login(staff)
+        response = client.get(reverse('cache_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('prefixes', response.json())
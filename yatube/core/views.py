@@ -1,3 +1,6 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
 from django.shortcuts import render
 
 
@@ -28,3 +31,13 @@ def permission_denied(request, exception):
     """View функция страницы 403"""
 
     return render(request, 'core/403.html', status=403)
+
+
+@staff_member_required
+def cache_stats(request):
+    """View функция статистики кеша текущего процесса"""
+
+    if not hasattr(cache, 'get_stats'):
+        raise Http404('Бэкенд кеша не ведёт статистику')
+
+    return JsonResponse(cache.get_stats())
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import search_posts
 
 
 @admin.register(Post)
@@ -13,6 +14,13 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по индексу FTS5 вместо LIKE по всей таблице"""
+        if not search_term:
+            return queryset, False
+
+        return search_posts(search_term, queryset), False
+
 
 admin.site.register(Group)
 admin.site.register(Comment)
@@ -0,0 +1,273 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import NoReverseMatch, reverse
+
+from . import metrics
+from .constants import (AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_LOCK_TIMEOUT,
+                        AUTOCOMPLETE_LOG_TIMEOUT)
+from .models import Group, User
+
+GENERATION_KEY = 'generation:autocomplete'
+AUTOCOMPLETE_USER_FIELDS = {'username', 'first_name', 'last_name'}
+POLL_INTERVAL = 0.01
+
+metrics.register('autocomplete.rebuilds', 'autocomplete.replayed_changes')
+
+
+def normalize(text):
+    """Ключ сравнения: без регистра, ё не отличается от е"""
+    return text.casefold().replace('ё', 'е')
+
+
+def get_url(view_name, **kwargs):
+    """Адрес страницы подсказки; None, если значение не подходит к адресу"""
+    try:
+        return reverse(view_name, kwargs=kwargs)
+    except NoReverseMatch:
+        return None
+
+
+def get_user_entry(pk, username, first_name, last_name):
+    """Подсказка для профиля: ищется по нику, имени и фамилии"""
+    full_name = f'{first_name} {last_name}'.strip()
+    keys = {username, full_name, *full_name.split()}
+    return (
+        ('user', pk),
+        {
+            'type': 'user',
+            'value': username,
+            'label': full_name or username,
+            'url': get_url('posts:profile', username=username),
+        },
+        {normalize(key) for key in keys if key},
+    )
+
+
+def get_group_entry(pk, slug, title):
+    """Подсказка для группы: ищется по слагу, названию и его словам"""
+    keys = {slug, title, *title.split()}
+    return (
+        ('group', pk),
+        {
+            'type': 'group',
+            'value': slug,
+            'label': title,
+            'url': get_url('posts:group_list', slug=slug),
+        },
+        {normalize(key) for key in keys if key},
+    )
+
+
+class PrefixIndex:
+    """Отсортированный массив ключей, префикс ищется двоичным поиском.
+
+    Массив хранит пары (ключ, идентификатор подсказки): все ключи с
+    одним префиксом лежат в нём подряд, начиная с bisect_left(префикс).
+    """
+
+    def __init__(self, entries=(), generation=None, seq=0):
+        self.generation = generation
+        self.seq = seq
+        self.items = {}
+        self.keys = []
+        self.lock = threading.Lock()
+        for identity, item, keys in entries:
+            self.items[identity] = (item, keys)
+            self.keys.extend((key, identity) for key in keys)
+        self.keys.sort()
+
+    def search(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        """Подсказки, у которых хотя бы один ключ начинается с prefix"""
+        prefix = normalize(prefix)
+        keys = self.keys
+        found = {}
+        position = bisect_left(keys, (prefix,))
+        while position < len(keys) and len(found) < limit:
+            key, identity = keys[position]
+            if not key.startswith(prefix):
+                break
+            if identity not in found:
+                found[identity] = self.items[identity][0]
+            position += 1
+
+        return list(found.values())
+
+    def put(self, identity, item=None, keys=frozenset()):
+        """Заменяет подсказку, без item - удаляет. True, если она изменилась"""
+        with self.lock:
+            old_item, old_keys = self.items.get(identity, (None, frozenset()))
+            if old_item == item and old_keys == keys:
+                return False
+            # Массив меняется копией: поиск в других потоках идёт без
+            # блокировки и должен видеть его целиком старым или новым.
+            new_keys = [
+                entry for entry in self.keys
+                if entry[1] != identity
+            ] if old_keys else list(self.keys)
+            for key in keys:
+                insort(new_keys, (key, identity))
+            # Подсказка появляется раньше своих ключей и пропадает позже.
+            if item is not None:
+                self.items[identity] = (item, keys)
+            self.keys = new_keys
+            if item is None:
+                self.items.pop(identity, None)
+
+        return True
+
+
+def _log_key(generation, name):
+    return f'autocomplete:{generation}:{name}'
+
+
+def get_generation():
+    """Поколение журнала изменений; новое, если журнала ещё нет.
+
+    Счётчик изменений создаётся раньше поколения: без счётчика
+    журнал считается потерянным и начинается заново.
+    """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = uuid4().hex
+        cache.set(_log_key(generation, 'seq'), 0, None)
+        cache.add(GENERATION_KEY, generation, None)
+        generation = cache.get(GENERATION_KEY)
+
+    return generation
+
+
+def build_index(generation):
+    """Строит индекс по всем пользователям и группам.
+
+    Номер последнего изменения журнала читается до чтения базы:
+    изменения после него индекс доиграет, повтор изменения безвреден.
+    """
+    metrics.incr('autocomplete.rebuilds')
+    seq = cache.get(_log_key(generation, 'published'), 0)
+    users = User.objects.values_list(
+        'pk',
+        'username',
+        'first_name',
+        'last_name',
+    )
+    groups = Group.objects.values_list('pk', 'slug', 'title')
+
+    return PrefixIndex(
+        [
+            *(get_user_entry(*user) for user in users.iterator()),
+            *(get_group_entry(*group) for group in groups.iterator()),
+        ],
+        generation=generation,
+        seq=seq,
+    )
+
+
+_index = PrefixIndex()
+_index_lock = threading.Lock()
+
+
+def replay_changes(index, published):
+    """Доигрывает изменения журнала; False, если в нём есть пропуск"""
+    numbers = range(index.seq + 1, published + 1)
+    keys = [_log_key(index.generation, number) for number in numbers]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return False
+    for key in keys:
+        index.put(*changes[key])
+    index.seq = published
+    metrics.incr('autocomplete.replayed_changes', len(keys))
+
+    return True
+
+
+def get_index():
+    """Индекс процесса, сверенный с журналом изменений в общем кеше.
+
+    Процесс доигрывает изменения других процессов из журнала. Заново
+    индекс строится, только если журнал потерян или в нём пропуск.
+    Строит его один поток, остальные пока отвечают старым индексом.
+    Журнал читается из памяти процесса (L1 кеша), база не трогается.
+    """
+    global _index
+    generation = get_generation()
+    published = cache.get(_log_key(generation, 'published'), 0)
+    index = _index
+    if index.generation == generation and index.seq >= published:
+        return index
+    if not _index_lock.acquire(blocking=index.generation is None):
+        return index
+    try:
+        index = _index
+        if index.generation != generation or not replay_changes(
+            index,
+            published,
+        ):
+            _index = build_index(generation)
+    finally:
+        _index_lock.release()
+
+    return _index
+
+
+def get_suggestions(prefix, limit=AUTOCOMPLETE_LIMIT):
+    """Подсказки профилей и групп по началу ника, имени или названия"""
+    if not prefix.strip():
+        return []
+
+    return get_index().search(prefix.strip(), limit)
+
+
+def _acquire(lock_key):
+    deadline = time.monotonic() + AUTOCOMPLETE_LOCK_TIMEOUT
+    while not cache.add(lock_key, 1, AUTOCOMPLETE_LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(POLL_INTERVAL)
+
+    return True
+
+
+def publish_change(identity, item=None, keys=frozenset()):
+    """Записывает изменение подсказки в журнал для других процессов.
+
+    Номер берётся и публикуется под блокировкой: читатель не увидит
+    номер, пока изменение под ним не записано. Без блокировки или
+    потеряв счётчик, журнал начинается заново: процессы перестроят
+    индекс.
+    """
+    generation = get_generation()
+    lock_key = _log_key(generation, 'lock')
+    if not _acquire(lock_key):
+        cache.delete(GENERATION_KEY)
+        return
+    try:
+        seq = cache.incr(_log_key(generation, 'seq'))
+        cache.set(
+            _log_key(generation, seq),
+            (identity, item, keys),
+            AUTOCOMPLETE_LOG_TIMEOUT,
+        )
+        cache.set(_log_key(generation, 'published'), seq, None)
+    except ValueError:
+        cache.delete(GENERATION_KEY)
+    finally:
+        cache.delete(lock_key)
+
+
+def update_entry(identity, item=None, keys=frozenset()):
+    """После коммита меняет подсказку в индексе процесса; без item - удаляет.
+
+    В журнал попадают только настоящие изменения: сохранение
+    пользователя при каждом входе не пишет в общий кеш.
+    """
+    def update():
+        if get_index().put(identity, item, keys):
+            publish_change(identity, item, keys)
+
+    transaction.on_commit(update)
@@ -0,0 +1,201 @@
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from hashlib import md5
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+from core.holes import defer_holes, fill_holes
+
+from . import metrics
+from .constants import (FEED_CACHE_HARD_TIMEOUT, FEED_CACHE_LOCK_TIMEOUT,
+                        FEED_CACHE_SOFT_TIMEOUT, FEED_CACHE_WAIT)
+
+POLL_INTERVAL = 0.05
+
+metrics.register(
+    'feed_cache.hits',
+    'feed_cache.stale',
+    'feed_cache.misses',
+    'feed_cache.revalidations',
+)
+
+
+def _generation_key(scope):
+    return f'generation:{scope}'
+
+
+def _bumped_at_key(scope):
+    return f'bumped_at:{scope}'
+
+
+def get_generations(scopes):
+    """Текущие поколения областей кеша; недостающие создаются.
+
+    Поколение - случайная строка, а не счётчик: если ключ вытеснят,
+    новое значение не совпадёт ни с одним из старых.
+    """
+    keys = [_generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in generations}
+    cache.set_many(missing, None)
+    generations.update(missing)
+
+    return [generations[key] for key in keys]
+
+
+def get_bumped_at(scopes):
+    """Когда последний раз сдвигалось поколение одной из областей.
+
+    Нет записи - время текущее: поколение могли вытеснить и создать
+    заново, и старым валидаторам верить уже нельзя.
+    """
+    keys = [_bumped_at_key(scope) for scope in scopes]
+    times = cache.get_many(keys)
+    now = time.time()
+    missing = {key: now for key in keys if key not in times}
+    cache.set_many(missing, None)
+    times.update(missing)
+
+    return datetime.fromtimestamp(max(times.values()), tz=timezone.utc)
+
+
+def bump_generations(*scopes):
+    """Делает устаревшими страницы и счётчики постов областей scopes"""
+    now = time.time()
+    cache.set_many(
+        {
+            **{_generation_key(scope): uuid4().hex for scope in scopes},
+            **{_bumped_at_key(scope): now for scope in scopes},
+        },
+        None,
+    )
+    cache.delete_many([f'posts_count:{scope}' for scope in scopes])
+
+
+def get_request_scopes(request, get_scopes, *args, **kwargs):
+    """Области кеша страницы, посчитанные один раз за запрос"""
+    if not hasattr(request, 'cache_scopes'):
+        request.cache_scopes = get_scopes(*args, **kwargs)
+
+    return request.cache_scopes
+
+
+def get_post_scopes(post, group_slugs=()):
+    """Области кеша лент, в которые попадает пост"""
+    scopes = {'index', f'profile:{post.author.username}', f'post:{post.pk}'}
+    if post.group_id:
+        scopes.add(f'group:{post.group.slug}')
+    scopes.update(f'group:{slug}' for slug in group_slugs if slug)
+
+    return scopes
+
+
+def get_response_key(request, scopes):
+    """Ключ ответа: поколения областей и адрес запроса.
+
+    Cookie в ключ не входят: в кеше лежит страница без данных
+    пользователя, их подставляет fill_holes при выдаче.
+    """
+    generations = ':'.join(
+        f'{scope}.{generation}'
+        for scope, generation in zip(scopes, get_generations(scopes))
+    )
+    url = md5(request.build_absolute_uri().encode()).hexdigest()
+
+    return f'feed:{generations}:{url}'
+
+
+def _wait_for_response(key):
+    """Ждёт ответ, который сейчас строит другой процесс"""
+    deadline = time.monotonic() + FEED_CACHE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[1]
+
+    return None
+
+
+def _is_cacheable(response):
+    """Ответ можно отдавать другим пользователям"""
+    return response.status_code == 200 and not response.cookies
+
+
+def _lookup(key, lock_key):
+    """Ответ из кеша и признак того, что строить новый выпало нам"""
+    entry = cache.get(key)
+    if entry is None:
+        metrics.incr('feed_cache.misses')
+        if cache.add(lock_key, 1, FEED_CACHE_LOCK_TIMEOUT):
+            return None, True
+        return _wait_for_response(key), False
+
+    fresh_until, response = entry
+    if time.time() < fresh_until:
+        metrics.incr('feed_cache.hits')
+        return response, False
+    if not cache.add(lock_key, 1, FEED_CACHE_LOCK_TIMEOUT):
+        metrics.incr('feed_cache.stale')
+        return response, False
+    metrics.incr('feed_cache.revalidations')
+
+    return None, True
+
+
+def cache_feed(
+    get_scopes,
+    soft_timeout=FEED_CACHE_SOFT_TIMEOUT,
+    hard_timeout=FEED_CACHE_HARD_TIMEOUT,
+):
+    """Кеширует страницу ленты с ключом из поколений её областей.
+
+    get_scopes получает аргументы вью и возвращает имена областей.
+    Сигналы сдвигают поколения при изменении постов, групп и
+    комментариев, поэтому таймауты могут быть долгими.
+
+    После soft_timeout запись считается устаревшей, но ещё живёт до
+    hard_timeout: её отдают всем, пока один процесс, взявший
+    блокировку в кеше, строит новую. При промахе остальные запросы
+    ждут этот процесс, а не строят страницу одновременно с ним.
+
+    Одна и та же запись отдаётся гостям и пользователям: вью рендерит
+    вместо шапки, кнопок подписки и правки метки {% hole %}, а
+    fill_holes заполняет их для каждого запроса. Гостям это не стоит
+    запросов к базе.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            key = get_response_key(
+                request,
+                get_request_scopes(request, get_scopes, *args, **kwargs),
+            )
+            lock_key = f'{key}:lock'
+            response, locked = _lookup(key, lock_key)
+            if response is None:
+                defer_holes(request)
+                try:
+                    response = view_func(request, *args, **kwargs)
+                    if _is_cacheable(response):
+                        cache.set(
+                            key,
+                            (time.time() + soft_timeout, response),
+                            hard_timeout,
+                        )
+                finally:
+                    if locked:
+                        cache.delete(lock_key)
+            patch_vary_headers(response, ('Cookie',))
+
+            return fill_holes(request, response)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,88 @@
+from hashlib import md5
+
+from django.db.models import Max
+from django.views.decorators.http import condition
+
+from .caching import get_bumped_at, get_generations, get_request_scopes
+from .holes import is_following
+from .models import Post
+
+
+def get_posts_last_modified(**filters):
+    """Время последнего добавления или правки поста в выборке"""
+    return Post.objects.filter(**filters).aggregate(
+        last_modified=Max('updated_at'),
+    )['last_modified']
+
+
+def get_post_last_modified(post_id):
+    """Время последней правки поста или комментария к нему"""
+    dates = Post.objects.filter(pk=post_id).aggregate(
+        updated_at=Max('updated_at'),
+        commented_at=Max('comments__created'),
+    )
+    dates = [date for date in dates.values() if date is not None]
+
+    return max(dates) if dates else None
+
+
+def get_author_username(scopes):
+    """Автор страницы - из её области кеша профиля"""
+    for scope in scopes:
+        if scope.startswith('profile:'):
+            return scope[len('profile:'):]
+
+    return None
+
+
+def get_viewer_etag(request, scopes, follow_author=False):
+    """ETag страницы для того, кто её смотрит.
+
+    Поколения областей кеша сдвигаются и при удалении постов, которое
+    не оставляет следа в updated_at. Пользователь и его подписка на
+    автора входят в тег, потому что от них зависят шапка и кнопки.
+    """
+    parts = [*get_generations(scopes), str(request.user.pk)]
+    if follow_author:
+        parts.append(str(
+            is_following(request, get_author_username(scopes)),
+        ))
+
+    return md5('|'.join(parts).encode()).hexdigest()
+
+
+def conditional_feed(get_scopes, get_last_modified, follow_author=False):
+    """Отвечает 304 Not Modified, если страница не менялась.
+
+    get_scopes и get_last_modified получают аргументы вью. Области
+    считаются один раз за запрос и достаются и ключу кеша страницы.
+    follow_author - страница показывает кнопку подписки на автора из
+    её области profile:; подписка узнаётся один раз за запрос, и её
+    берут и ETag, и кнопка.
+
+    Last-Modified учитывает и сдвиги поколений: удаление поста или
+    комментария не оставляет следа в базе. Пользователю Last-Modified
+    не отдаётся: дата не знает, кто смотрит страницу, и по одному
+    If-Modified-Since гость получил бы страницу пользователя или
+    наоборот. Пользователю 304 отдаётся только по ETag.
+    """
+    def etag(request, *args, **kwargs):
+        return get_viewer_etag(
+            request,
+            get_request_scopes(request, get_scopes, *args, **kwargs),
+            follow_author,
+        )
+
+    def last_modified(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        dates = [
+            get_last_modified(*args, **kwargs),
+            get_bumped_at(
+                get_request_scopes(request, get_scopes, *args, **kwargs),
+            ),
+        ]
+
+        return max(date for date in dates if date is not None)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
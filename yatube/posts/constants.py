@@ -1,2 +1,52 @@
 POSTS_LIMIT = 10
 MAX_CHAR_LIMIT = 40
+FEED_ORDERING = ('-pub_date', '-id')
+FEED_KEY = ('pub_date', 'id')
+PAGE_WINDOW_ON_EACH_SIDE = 2
+PAGE_WINDOW_ON_ENDS = 1
+COUNT_CACHE_TIMEOUT = 60
+TIMELINE_LIMIT = 500
+SEARCH_MAX_PAGES = 50
+FANOUT_FOLLOWER_LIMIT = 10000
+FANOUT_AUTHORS_TIMEOUT = 300
+POST_CARD_TIMEOUT = 60 * 60 * 24
+FEED_CACHE_SOFT_TIMEOUT = 60 * 15
+FEED_CACHE_HARD_TIMEOUT = 60 * 60
+FEED_CACHE_LOCK_TIMEOUT = 30
+FEED_CACHE_WAIT = 2
+IMAGE_MAX_SIZE = (1920, 1920)
+IMAGE_QUALITY = 85
+IMAGE_PLACEHOLDER_SIZE = (16, 16)
+IMAGE_PLACEHOLDER_QUALITY = 50
+IMAGE_PLACEHOLDER_BLUR = 1
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+    'card_2x': ('1920x678', {'crop': 'center', 'upscale': False}),
+}
+THUMBNAIL_WORKERS = 2
+METRICS_FLUSH_INTERVAL = 10
+THUMBNAIL_RETRY_TIMEOUT = 60 * 60
+MEDIA_SHARD_DEPTH = 2
+MEDIA_SHARD_WIDTH = 2
+MEDIA_GRACE_PERIOD = 60 * 60
+TAG_MAX_LENGTH = 50
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_QUERY_LENGTH = 150
+AUTOCOMPLETE_LOG_TIMEOUT = 24 * 60 * 60
+AUTOCOMPLETE_LOCK_TIMEOUT = 5
+POST_EXCERPT_LENGTH = 500
+POST_CARD_FIELDS = (
+    'excerpt',
+    'pub_date',
+    'image',
+    'image_width',
+    'image_height',
+    'image_placeholder',
+    'author',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group',
+    'group__slug',
+    'group__title',
+)
@@ -1,5 +1,6 @@
 from django import forms
 
+from .images import ingest_image
 from .models import Comment, Post
 
 
@@ -10,6 +11,14 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        """Новая картинка уменьшается и очищается от метаданных"""
+        image = self.cleaned_data.get('image')
+        if image and image != self.initial.get('image'):
+            return ingest_image(image)
+
+        return image
+
 
 class CommentForm(forms.ModelForm):
     """Форма заполнения комментария к посту"""
@@ -0,0 +1,50 @@
+from core.holes import register
+
+from .forms import CommentForm
+from .models import Follow
+
+
+@register('edit_link', 'posts/includes/edit_link.html')
+def edit_link(request, post_id, author_id):
+    return {
+        'post_id': post_id,
+        'is_author': request.user.pk == author_id,
+    }
+
+
+def is_following(request, username):
+    """Подписан ли пользователь на автора; узнаётся один раз за запрос.
+
+    Флаг нужен и ETag, и кнопке подписки, поэтому запоминается в
+    request.
+    """
+    if not hasattr(request, 'followed_authors'):
+        request.followed_authors = {}
+    if username not in request.followed_authors:
+        request.followed_authors[username] = (
+            request.user.is_authenticated and Follow.objects.filter(
+                user=request.user,
+                author__username=username,
+            ).exists()
+        )
+
+    return request.followed_authors[username]
+
+
+@register('follow_button', 'posts/includes/follow_button.html')
+def follow_button(request, username):
+    return {
+        'username': username,
+        'is_author': request.user.get_username() == username,
+        'following': is_following(request, username),
+    }
+
+
+@register('switcher', 'posts/includes/switcher.html')
+def switcher(request, active):
+    return {'active': active}
+
+
+@register('comment_form', 'posts/includes/comment_form.html')
+def comment_form(request, post_id):
+    return {'post_id': post_id, 'form': CommentForm()}
@@ -0,0 +1,141 @@
+import os
+import time
+from base64 import b64encode
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageFilter, ImageOps
+
+from . import metrics
+from .constants import (
+    IMAGE_MAX_SIZE,
+    IMAGE_PLACEHOLDER_BLUR,
+    IMAGE_PLACEHOLDER_QUALITY,
+    IMAGE_PLACEHOLDER_SIZE,
+    IMAGE_QUALITY,
+    MEDIA_GRACE_PERIOD,
+)
+from .models import Post
+
+metrics.register(
+    'images.ingested',
+    'images.bytes_uploaded',
+    'images.bytes_stored',
+    'images.released',
+    'images.release_deferred',
+)
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def ingest_image(uploaded):
+    """Готовит загруженную картинку к хранению.
+
+    Поворачивает её по EXIF, уменьшает до IMAGE_MAX_SIZE и пережимает
+    без метаданных: в JPEG с качеством IMAGE_QUALITY или, если есть
+    прозрачность, в PNG. Анимацию и картинки, которые после пережатия
+    только выросли бы, оставляет как есть. Байты до и после
+    складываются в показатели images.*.
+    """
+    uploaded.seek(0)
+    image = Image.open(uploaded)
+    if getattr(image, 'is_animated', False):
+        return uploaded
+    has_metadata = bool(image.info.get('exif'))
+    image = ImageOps.exif_transpose(image)
+    original_size = image.size
+    image.thumbnail(IMAGE_MAX_SIZE, Image.LANCZOS)
+    output = BytesIO()
+    if _has_alpha(image):
+        image.save(output, 'PNG', optimize=True)
+        extension = 'png'
+    else:
+        image.convert('RGB').save(
+            output,
+            'JPEG',
+            quality=IMAGE_QUALITY,
+            optimize=True,
+            progressive=True,
+        )
+        extension = 'jpg'
+    data = output.getvalue()
+    if (
+        len(data) >= uploaded.size
+        and image.size == original_size
+        and not has_metadata
+    ):
+        uploaded.seek(0)
+        return uploaded
+    metrics.incr('images.ingested')
+    metrics.incr('images.bytes_uploaded', uploaded.size)
+    metrics.incr('images.bytes_stored', len(data))
+    stem = os.path.splitext(os.path.basename(uploaded.name))[0]
+
+    return ContentFile(data, name=f'{stem}.{extension}')
+
+
+def read_image_metadata(file):
+    """Ширина, высота и размытая заглушка картинки для полей Post"""
+    file.seek(0)
+    width, height = Image.open(file).size
+
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_placeholder': make_placeholder(file),
+    }
+
+
+def make_placeholder(file):
+    """Крошечная размытая копия картинки в виде data URI.
+
+    Шаблон показывает её, пока грузится настоящая картинка или
+    строятся миниатюры. Весит несколько сотен байт.
+    """
+    file.seek(0)
+    image = ImageOps.exif_transpose(Image.open(file))
+    image.thumbnail(IMAGE_PLACEHOLDER_SIZE)
+    image = image.convert('RGB').filter(
+        ImageFilter.GaussianBlur(IMAGE_PLACEHOLDER_BLUR),
+    )
+    output = BytesIO()
+    image.save(output, 'JPEG', quality=IMAGE_PLACEHOLDER_QUALITY)
+    file.seek(0)
+    data = b64encode(output.getvalue()).decode()
+
+    return f'data:image/jpeg;base64,{data}'
+
+
+def release_image(name):
+    """Удаляет файл картинки, когда на него больше не ссылаются посты.
+
+    Одинаковые загрузки хранятся одним файлом, поэтому число ссылок -
+    это число постов с таким именем картинки. Проверка идёт после
+    коммита: откат транзакции не должен оставить пост без файла.
+    Файл, тронутый позже MEDIA_GRACE_PERIOD назад, остаётся для
+    gc_media: его могли только что загрузить снова для нового поста.
+    Файлы со старыми именами не из хеша не трогаются.
+    """
+    storage = Post._meta.get_field('image').storage
+    if not name or not storage.is_content_name(name):
+        return
+
+    def release():
+        if Post.objects.filter(image=name).exists():
+            return
+        try:
+            modified = os.stat(storage.path(name)).st_mtime
+        except FileNotFoundError:
+            return
+        if modified > time.time() - MEDIA_GRACE_PERIOD:
+            metrics.incr('images.release_deferred')
+            return
+        storage.delete(name)
+        metrics.incr('images.released')
+
+    transaction.on_commit(release)
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.images import read_image_metadata
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    """Заполнение размеров и заглушек картинок старых постов"""
+
+    help = (
+        'Записывает ширину, высоту и размытую заглушку картинкам постов, '
+        'загруженным до появления этих полей'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересчитать и посты, у которых всё уже заполнено',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').order_by('pk')
+        if not options['force']:
+            posts = posts.filter(
+                Q(image_width__isnull=True) | Q(image_placeholder=''),
+            )
+        filled = 0
+        failures = []
+        for post in posts.iterator():
+            try:
+                with post.image.open() as file:
+                    metadata = read_image_metadata(file)
+            except (OSError, ValueError) as error:
+                failures.append((post.image.name, error))
+                continue
+            for field, value in metadata.items():
+                setattr(post, field, value)
+            # Сохранение через save() сбрасывает кеш лент с этим постом
+            # и сдвигает его Last-Modified: разметка карточки изменилась.
+            post.save(update_fields=(*metadata, 'updated_at'))
+            filled += 1
+        for name, error in failures:
+            self.stderr.write(f'{name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнено: {filled}, ошибок: {len(failures)}',
+        ))
@@ -0,0 +1,84 @@
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.constants import FEED_ORDERING, POSTS_LIMIT
+from posts.models import Group, Post
+from posts.utils import make_excerpt, select_card_fields
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Память и время страницы ленты с проекцией колонок и без неё"""
+
+    help = (
+        'Во временной транзакции создаёт посты с длинными текстами и '
+        'меряет, сколько памяти и времени занимает страница ленты из '
+        f'{POSTS_LIMIT} постов с select_related и с проекцией колонок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=POSTS_LIMIT)
+        parser.add_argument('--text-size', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def fill(self, posts, text_size):
+        """Посты автора с хешем пароля и группы с длинным описанием"""
+        author = User.objects.create(
+            username='feed-benchmark',
+            first_name='Имя',
+            last_name='Фамилия',
+            email='feed-benchmark@example.com',
+            password=make_password(None),
+        )
+        group = Group.objects.create(
+            title='Группа',
+            slug='feed-benchmark',
+            description='описание ' * 200,
+        )
+        text = ('слово ' * (text_size // 6 + 1))[:text_size]
+        Post.objects.bulk_create(
+            Post(
+                author=author,
+                group=group,
+                text=text,
+                excerpt=make_excerpt(text),
+            )
+            for _ in range(posts)
+        )
+
+    def measure(self, queryset, repeat):
+        """Байты объектов страницы, пик памяти при чтении и время в мс"""
+        tracemalloc.start()
+        page = list(queryset[:POSTS_LIMIT])
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del page
+        started = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset[:POSTS_LIMIT])
+
+        return retained, peak, (time.perf_counter() - started) / repeat * 1000
+
+    def handle(self, *args, **options):
+        feeds = {
+            'select_related': Post.objects.select_related('group', 'author'),
+            'проекция': select_card_fields(Post.objects.all()),
+        }
+        with transaction.atomic():
+            self.fill(options['posts'], options['text_size'])
+            for title, queryset in feeds.items():
+                retained, peak, elapsed = self.measure(
+                    queryset.order_by(*FEED_ORDERING),
+                    options['repeat'],
+                )
+                self.stdout.write(
+                    f'{title}: страница {retained / 1024:.1f} КБ, '
+                    f'пик {peak / 1024:.1f} КБ, {elapsed:.2f} мс'
+                )
+            transaction.set_rollback(True)
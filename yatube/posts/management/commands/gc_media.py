@@ -0,0 +1,178 @@
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from posts.constants import MEDIA_GRACE_PERIOD
+from posts.models import Post
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    """Удаление картинок, на которые не ссылается ни один пост"""
+
+    help = (
+        'Ищет в хранилище картинки без постов и их миниатюры, а в kvstore '
+        'sorl - устаревшие ключи. По умолчанию только считает, удаляет '
+        'с --delete'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='Удалить найденное, а не только посчитать',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=MEDIA_GRACE_PERIOD,
+            help='Файлы моложе стольких секунд не трогаются',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько имён сверять с базой за один запрос',
+        )
+
+    def is_old(self, storage, name):
+        """Файл давно не менялся: его не загружают прямо сейчас"""
+        try:
+            return os.stat(storage.path(name)).st_mtime < self.cutoff
+        except FileNotFoundError:
+            return True
+
+    def walk(self, storage, directory):
+        """Старые файлы каталога хранилища, по одному, без списка в памяти"""
+        root = storage.path(directory)
+        for path, _, files in os.walk(root):
+            for file_name in files:
+                name = os.path.relpath(os.path.join(path, file_name), root)
+                name = '/'.join((directory.rstrip('/'), *name.split(os.sep)))
+                if self.is_old(storage, name):
+                    yield name
+
+    def remove_file(self, kind, storage, name):
+        try:
+            size = storage.size(name)
+        except OSError:
+            return
+        self.files[kind][0] += 1
+        self.files[kind][1] += size
+        if self.options['delete']:
+            storage.delete(name)
+
+    def remove_source(self, source):
+        """Миниатюры, ключи kvstore и сам файл картинки без постов.
+
+        Недавно тронутый файл пропускается целиком: его могли только что
+        загрузить снова, и хранилище нашло его по хешу.
+        """
+        if source.exists() and not self.is_old(source.storage, source.name):
+            return
+        self.removed_sources.add(source.name)
+        kvstore = default.kvstore
+        thumbnail_keys = kvstore._get(source.key, identity='thumbnails') or []
+        for key in thumbnail_keys:
+            thumbnail = kvstore._get(key)
+            if thumbnail:
+                self.remove_file(
+                    'thumbnails',
+                    thumbnail.storage,
+                    thumbnail.name,
+                )
+        keys = list(KVStoreModel.objects.filter(key__in=[
+            add_prefix(source.key),
+            add_prefix(source.key, 'thumbnails'),
+            *(add_prefix(key) for key in thumbnail_keys),
+        ]).values_list('key', flat=True))
+        self.keys += len(keys)
+        if self.options['delete'] and keys:
+            kvstore._delete_raw(*keys)
+        if source.exists():
+            self.remove_file('originals', source.storage, source.name)
+
+    def get_orphans(self, names):
+        referenced = set(Post.objects.filter(image__in=names).values_list(
+            'image',
+            flat=True,
+        ))
+
+        return [name for name in names if name not in referenced]
+
+    def collect_originals(self):
+        """Файлы в каталоге картинок постов без ссылок из базы"""
+        storage = Post._meta.get_field('image').storage
+        directory = Post._meta.get_field('image').upload_to
+        for names in batched(self.walk(storage, directory), self.batch_size):
+            for name in self.get_orphans(names):
+                self.remove_source(ImageFile(name, storage))
+
+    def collect_sources(self):
+        """Исходники из kvstore, чьих файлов и постов уже нет"""
+        keys = KVStoreModel.objects.filter(
+            key__startswith=add_prefix('', 'thumbnails'),
+        ).values_list('key', flat=True)
+        for batch in batched(keys.iterator(), self.batch_size):
+            sources = [
+                deserialize_image_file(value)
+                for value in KVStoreModel.objects.filter(key__in=[
+                    add_prefix(del_prefix(key)) for key in batch
+                ]).values_list('value', flat=True)
+            ]
+            sources = {
+                source.name: source for source in sources
+                if source.name not in self.removed_sources
+            }
+            for name in self.get_orphans(list(sources)):
+                self.remove_source(sources[name])
+
+    def collect_thumbnails(self):
+        """Файлы миниатюр, о которых kvstore ничего не знает"""
+        storage = default.storage
+        names = self.walk(storage, thumbnail_settings.THUMBNAIL_PREFIX)
+        for batch in batched(names, self.batch_size):
+            keys = {
+                add_prefix(ImageFile(name, storage).key): name
+                for name in batch
+            }
+            known = set(KVStoreModel.objects.filter(
+                key__in=list(keys),
+            ).values_list('key', flat=True))
+            for key, name in keys.items():
+                if key not in known:
+                    self.remove_file('thumbnails', storage, name)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.cutoff = time.time() - options['min_age']
+        self.batch_size = options['batch_size']
+        self.files = {'originals': [0, 0], 'thumbnails': [0, 0]}
+        self.keys = 0
+        self.removed_sources = set()
+        self.collect_originals()
+        self.collect_sources()
+        self.collect_thumbnails()
+        originals, original_bytes = self.files['originals']
+        thumbnails, thumbnail_bytes = self.files['thumbnails']
+        action = 'Удалено' if options['delete'] else 'Можно удалить'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action}: картинок {originals}, миниатюр {thumbnails}, '
+            f'ключей kvstore {self.keys}, '
+            f'{(original_bytes + thumbnail_bytes) / 1024 / 1024:.1f} МБ',
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.metrics import get_metrics
+
+
+class Command(BaseCommand):
+    """Вывод накопленных показателей приложения Posts"""
+
+    help = 'Показывает счётчики раскладки лент, кеша и других подсистем'
+
+    def handle(self, *args, **options):
+        for name, value in get_metrics().items():
+            self.stdout.write(f'{name}: {value}')
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.stats import recount_user_stats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Пересчёт денормализованных счётчиков пользователей"""
+
+    help = 'Пересчитывает счётчики постов и подписок пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Чьи счётчики пересчитать (по умолчанию все)',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        recounted = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            recount_user_stats(user_id)
+            recounted += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {recounted}',
+        ))
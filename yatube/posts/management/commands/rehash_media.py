@@ -0,0 +1,45 @@
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    """Перенос картинок постов в хранилище с именами по хешу"""
+
+    help = (
+        'Копирует картинки постов со старыми именами в каталоги по хешу '
+        'содержимого и переписывает пути в базе'
+    )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        posts = Post.objects.exclude(image='').order_by('pk')
+        moved = deduplicated = 0
+        failures = []
+        for post in posts.iterator():
+            if storage.is_content_name(post.image.name):
+                continue
+            try:
+                with post.image.open() as file:
+                    name = storage.get_content_name(post.image.name, file)
+                    if storage.exists(name):
+                        deduplicated += 1
+                    else:
+                        storage.save(post.image.name, file)
+            except (OSError, SuspiciousFileOperation) as error:
+                failures.append((post.image.name, error))
+                continue
+            old_name, post.image.name = post.image.name, name
+            # Через save(): миниатюры строятся заново под новым именем,
+            # а кеш лент с этим постом сбрасывается.
+            post.save(update_fields=('image', 'updated_at'))
+            if not Post.objects.filter(image=old_name).exists():
+                storage.delete(old_name)
+            moved += 1
+        for name, error in failures:
+            self.stderr.write(f'{name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено: {moved}, из них совпало с уже лежащими: '
+            f'{deduplicated}, ошибок: {len(failures)}',
+        ))
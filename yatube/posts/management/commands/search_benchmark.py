@@ -0,0 +1,109 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+
+from posts.search import SEARCH_REBUILD, SEARCH_SCHEMA, SEARCH_TABLE
+
+ALPHABET = 'абвгдежзиклмнопрстуфхцчшэюя'
+VOCABULARY_SIZE = 50000
+WORDS_PER_POST = (5, 60)
+INSERT_BATCH = 10000
+
+
+def make_vocabulary(generator):
+    return list({
+        ''.join(generator.choices(ALPHABET, k=generator.randint(3, 10)))
+        for _ in range(VOCABULARY_SIZE)
+    })
+
+
+class Command(BaseCommand):
+    """Сравнение поиска FTS5 с LIKE на синтетической таблице постов"""
+
+    help = (
+        'Строит во временном файле таблицу постов со случайными текстами '
+        'и меряет поиск через LIKE и через индекс FTS5'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def fill(self, connection, rows, vocabulary, generator):
+        """Посты с текстами из слов словаря с частотами по закону Ципфа"""
+        cum_weights = list(accumulate(
+            1 / rank for rank in range(1, len(vocabulary) + 1)
+        ))
+        connection.execute(
+            'CREATE TABLE posts_post (id INTEGER PRIMARY KEY, text TEXT)',
+        )
+        for start in range(0, rows, INSERT_BATCH):
+            connection.executemany(
+                'INSERT INTO posts_post (text) VALUES (?)',
+                (
+                    (' '.join(generator.choices(
+                        vocabulary,
+                        cum_weights=cum_weights,
+                        k=generator.randint(*WORDS_PER_POST),
+                    )),)
+                    for _ in range(min(INSERT_BATCH, rows - start))
+                ),
+            )
+        for statement in (SEARCH_SCHEMA, *SEARCH_REBUILD):
+            connection.execute(statement)
+        connection.commit()
+
+    def measure(self, connection, sql, words):
+        started = time.perf_counter()
+        for word in words:
+            connection.execute(sql, (word,)).fetchall()
+
+        return (time.perf_counter() - started) / len(words) * 1000
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        vocabulary = make_vocabulary(generator)
+        # Запросы и по частым словам, и по редким: LIKE с LIMIT быстро
+        # находит частые слова и просматривает всю таблицу ради редких.
+        words = generator.sample(vocabulary, options['queries'])
+        queries = {
+            'LIKE, первая страница': (
+                'SELECT id FROM posts_post WHERE text LIKE ?'
+                ' ORDER BY id DESC LIMIT 10',
+                [f'%{word}%' for word in words],
+            ),
+            'FTS5, первая страница': (
+                f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE}'
+                ' MATCH ? ORDER BY rank LIMIT 10',
+                [f'"{word}"' for word in words],
+            ),
+            'LIKE, число найденных': (
+                'SELECT COUNT(*) FROM posts_post WHERE text LIKE ?',
+                [f'%{word}%' for word in words],
+            ),
+            'FTS5, число найденных': (
+                f'SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE}'
+                ' MATCH ?',
+                [f'"{word}"' for word in words],
+            ),
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            connection = sqlite3.connect(os.path.join(directory, 'bench.db'))
+            started = time.perf_counter()
+            self.fill(connection, options['rows'], vocabulary, generator)
+            self.stdout.write(
+                f'Таблица из {options["rows"]} постов с индексом: '
+                f'{time.perf_counter() - started:.1f} с'
+            )
+            for title, (sql, params) in queries.items():
+                self.stdout.write(
+                    f'{title}: {self.measure(connection, sql, params):.2f} '
+                    'мс на запрос'
+                )
+            connection.close()
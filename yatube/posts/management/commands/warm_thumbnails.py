@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.caching import bump_generations, get_post_scopes
+from posts.models import Post
+from posts.thumbnails import prefetch_thumbnails, warm_image
+
+CHECKPOINT_KEY = 'warm_thumbnails:last_pk'
+
+
+def close_connections():
+    """Дочерний процесс не пользуется соединениями, доставшимися от fork.
+
+    Процессы пула запускаются при первой задаче, когда у родителя уже
+    открыто соединение с базой: каждый ребёнок закрывает свою копию.
+    """
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    """Построение миниатюр всех картинок постов"""
+
+    help = (
+        'Строит недостающие миниатюры картинок постов в пуле процессов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Число процессов; 0 - строить в текущем процессе',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Сколько постов проверять за один запрос',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Продолжить с поста, на котором остановился прошлый запуск',
+        )
+
+    def get_batches(self, start_after, batch_size):
+        """Посты с картинками пачками по возрастанию pk"""
+        posts = Post.objects.exclude(image='').select_related(
+            'author',
+            'group',
+        ).order_by('pk')
+        while True:
+            batch = list(posts.filter(pk__gt=start_after)[:batch_size])
+            if not batch:
+                return
+            yield batch
+            start_after = batch[-1].pk
+
+    def get_missing(self, batch):
+        """Посты пачки, у которых не хватает хотя бы одной миниатюры"""
+        prefetch_thumbnails(batch)
+
+        return [
+            post for post in batch
+            if None in getattr(post, 'thumbnails', {None: None}).values()
+        ]
+
+    def handle(self, *args, **options):
+        start_after = cache.get(CHECKPOINT_KEY, 0) if options['resume'] else 0
+        workers = options['workers']
+        pool = None
+        if workers:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=close_connections,
+            )
+        warmed = skipped = 0
+        failures = []
+        started = time.perf_counter()
+        try:
+            for batch in self.get_batches(start_after, options['batch_size']):
+                missing = self.get_missing(batch)
+                skipped += len(batch) - len(missing)
+                names = [post.image.name for post in missing]
+                results = (
+                    pool.map(warm_image, names) if pool
+                    else map(warm_image, names)
+                )
+                failed = dict(result for result in results if result[1])
+                failures.extend(failed.items())
+                warmed += len(names) - len(failed)
+                scopes = set()
+                for post in missing:
+                    if post.image.name not in failed:
+                        scopes.update(get_post_scopes(post))
+                bump_generations(*scopes)
+                cache.set(CHECKPOINT_KEY, batch[-1].pk, None)
+        finally:
+            if pool:
+                pool.shutdown()
+        elapsed = time.perf_counter() - started
+        for name, error in failures:
+            self.stderr.write(f'{name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Построено: {warmed}, пропущено готовых: {skipped}, '
+            f'ошибок: {len(failures)}, '
+            f'{warmed / elapsed if elapsed else 0:.1f} картинок/с',
+        ))
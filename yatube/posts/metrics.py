@@ -0,0 +1,86 @@
+import atexit
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .constants import METRICS_FLUSH_INTERVAL
+
+METRICS_KEY_PREFIX = 'metrics'
+METRIC_NAMES = []
+
+_pending = Counter()
+_pending_lock = threading.Lock()
+_flushed_at = 0
+
+
+def _key(name):
+    return f'{METRICS_KEY_PREFIX}:{name}'
+
+
+def register(*names):
+    """Объявляет показатели, которые выводит команда metrics"""
+    METRIC_NAMES.extend(name for name in names if name not in METRIC_NAMES)
+
+
+def get_flush_interval():
+    """Секунды между сбросами счётчиков; 0 - сбрасывать сразу"""
+    return getattr(
+        settings,
+        'POSTS_METRICS_FLUSH_INTERVAL',
+        METRICS_FLUSH_INTERVAL,
+    )
+
+
+def flush():
+    """Переносит накопленные в процессе приращения в общий кеш"""
+    global _flushed_at
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _flushed_at = time.monotonic()
+    for name, delta in pending.items():
+        key = _key(name)
+        if cache.add(key, delta, None):
+            continue
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            cache.set(key, delta, None)
+
+
+def incr(name, delta=1):
+    """Увеличивает счётчик name на delta.
+
+    Приращения копятся в памяти процесса и уходят в общий кеш раз в
+    POSTS_METRICS_FLUSH_INTERVAL секунд и при чтении показателей:
+    запись в общий кеш на каждое событие заставляла бы все процессы
+    ждать его блокировку.
+    """
+    with _pending_lock:
+        _pending[name] += delta
+        due = time.monotonic() - _flushed_at >= get_flush_interval()
+    if due:
+        flush()
+
+
+def gauge(name, value):
+    """Запоминает текущее значение показателя name"""
+    cache.set(_key(name), value, None)
+
+
+def get_metrics(names=None):
+    """Словарь {имя: значение} для объявленных показателей.
+
+    Приращения других процессов видны после их очередного сброса.
+    """
+    flush()
+    names = METRIC_NAMES if names is None else names
+    values = cache.get_many([_key(name) for name in names])
+
+    return {name: values.get(_key(name), 0) for name in names}
+
+
+atexit.register(flush)
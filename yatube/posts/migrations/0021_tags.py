@@ -0,0 +1,65 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:48
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+HASHTAG_RE = re.compile(r'(?<![\w/&#])#(\w{1,50})\b')
+
+
+def index_existing_posts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Tag = apps.get_model('posts', 'Tag')
+    PostTag = apps.get_model('posts', 'PostTag')
+    tag_ids = {}
+    entries = []
+    posts = Post.objects.filter(text__contains='#').values_list(
+        'id', 'text', 'pub_date',
+    )
+    for post_id, text, pub_date in posts.iterator():
+        for name in {name.lower() for name in HASHTAG_RE.findall(text)}:
+            if name not in tag_ids:
+                tag_ids[name] = Tag.objects.create(name=name).id
+            entries.append(PostTag(
+                post_id=post_id, tag_id=tag_ids[name], pub_date=pub_date,
+            ))
+    PostTag.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Хештег')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Post', verbose_name='Публикация')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Tag', verbose_name='Хештег')),
+            ],
+            options={
+                'ordering': ('-pub_date', '-id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', '-pub_date', '-id'], name='post_tag_tag_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='posttag',
+            constraint=models.UniqueConstraint(fields=('post', 'tag'), name='unique_post_tag'),
+        ),
+        migrations.RunPython(index_existing_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:57
+
+from django.db import migrations, models
+
+EXCERPT_LENGTH = 500
+
+
+def make_excerpt(text):
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    cut = text[:EXCERPT_LENGTH]
+    if not text[EXCERPT_LENGTH].isspace():
+        head, *tail = cut.rsplit(None, 1)
+        if tail:
+            cut = head
+    return f'{cut.rstrip()}…'
+
+
+def fill_excerpts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    batch = []
+    for post in Post.objects.only('id', 'text').iterator():
+        post.excerpt = make_excerpt(post.text)
+        batch.append(post)
+        if len(batch) == 1000:
+            Post.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    Post.objects.bulk_update(batch, ['excerpt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, help_text='Начало текста для карточек в лентах', verbose_name='Начало публикации'),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
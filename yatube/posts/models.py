@@ -1,7 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
-from .constants import MAX_CHAR_LIMIT
+from .constants import MAX_CHAR_LIMIT, TAG_MAX_LENGTH
+from .storage import post_image_storage
 from .validators import validate_not_empty
 
 User = get_user_model()
@@ -15,7 +16,14 @@ class Post(models.Model):
         validators=[validate_not_empty],
         help_text='Введите текст вашей публикации',
     )
+    excerpt = models.TextField(
+        'Начало публикации',
+        blank=True,
+        editable=False,
+        help_text='Начало текста для карточек в лентах',
+    )
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -34,12 +42,55 @@ class Post(models.Model):
     image = models.ImageField(
         'Изображение',
         upload_to='posts/',
+        storage=post_image_storage,
         blank=True,
+        db_index=True,
         help_text='Загрузите изображение',
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина изображения',
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота изображения',
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    image_placeholder = models.TextField(
+        'Заглушка изображения',
+        blank=True,
+        editable=False,
+        help_text='Крошечная размытая копия картинки в виде data URI',
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(fields=['updated_at'], name='post_updated_at_idx'),
+            models.Index(
+                fields=['author', 'updated_at'],
+                name='post_author_updated_at_idx',
+            ),
+            models.Index(
+                fields=['group', 'updated_at'],
+                name='post_group_updated_at_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:MAX_CHAR_LIMIT]
@@ -80,6 +131,12 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('created',)
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:MAX_CHAR_LIMIT]
@@ -106,3 +163,102 @@ class Follow(models.Model):
             fields=['user', 'author'],
             name='unique_follow',
         )]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя"""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Публикация',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-post')
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'post'],
+            name='unique_timeline_entry',
+        )]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx',
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя"""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.IntegerField('Публикаций', default=0)
+    followers_count = models.IntegerField('Подписчиков', default=0)
+    following_count = models.IntegerField('Подписок', default=0)
+
+    def __str__(self):
+        return str(self.user)
+
+
+class Tag(models.Model):
+    """Модель хештегов из текстов публикаций"""
+
+    name = models.CharField(
+        'Хештег',
+        max_length=TAG_MAX_LENGTH,
+        unique=True,
+    )
+
+    def __str__(self):
+        return f'#{self.name}'
+
+
+class PostTag(models.Model):
+    """Запись инвертированного индекса: хештег встречается в публикации"""
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+        verbose_name='Публикация',
+    )
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+        verbose_name='Хештег',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-id')
+        constraints = [models.UniqueConstraint(
+            fields=['post', 'tag'],
+            name='unique_post_tag',
+        )]
+        indexes = [
+            models.Index(
+                fields=['tag', '-pub_date', '-id'],
+                name='post_tag_tag_pub_date_idx',
+            ),
+        ]
@@ -0,0 +1,246 @@
+import base64
+import binascii
+from math import ceil
+
+from django.core.cache import cache
+from django.core.paginator import (EmptyPage, Page, PageNotAnInteger,
+                                   Paginator)
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .constants import (COUNT_CACHE_TIMEOUT, FEED_KEY,
+                        PAGE_WINDOW_ON_EACH_SIDE, PAGE_WINDOW_ON_ENDS)
+
+# Наибольшее целое, которое помещается в INTEGER базы.
+MAX_ID = 2 ** 63 - 1
+
+
+def encode_cursor(post):
+    """Кодирует ключ (pub_date, id) публикации в непрозрачный курсор"""
+    raw = f'{post.pub_date.isoformat()}|{post.id}'.encode()
+
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Раскодирует курсор, для битого значения возвращает None"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        pub_date, post_id = raw.decode().split('|')
+        pub_date = parse_datetime(pub_date)
+        post_id = int(post_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if pub_date is None or not 1 <= post_id <= MAX_ID:
+        return None
+
+    return pub_date, post_id
+
+
+def get_ordering(key=FEED_KEY):
+    """Сортировка ленты от новых к старым по полям ключа"""
+    return [f'-{field}' for field in key]
+
+
+class KeysetPage(Page):
+    """Страница ленты, построенная по курсору, а не по номеру"""
+
+    def __init__(self, object_list, paginator, has_newer, has_older):
+        super().__init__(object_list, None, paginator)
+        self._has_newer = has_newer
+        self._has_older = has_older
+        self.previous_cursor = (
+            encode_cursor(object_list[0]) if has_newer else ''
+        )
+        self.next_cursor = encode_cursor(object_list[-1]) if has_older else ''
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self.object_list)} objects>'
+
+    def has_next(self):
+        return self._has_older
+
+    def has_previous(self):
+        return self._has_newer
+
+
+class KeysetPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id): без OFFSET и без COUNT(*).
+
+    Стоимость любой страницы одинакова: индексный поиск от курсора
+    и выборка per_page + 1 строк, лишняя строка говорит о продолжении.
+    key - поля выборки, по которым идут сортировка и сравнение с
+    курсором. Их значения должны совпадать с pub_date и id поста:
+    курсор кодируется из них.
+    """
+
+    def __init__(self, object_list, per_page, key=FEED_KEY, **kwargs):
+        self.key = key
+        super().__init__(
+            object_list.order_by(*get_ordering(key)),
+            per_page,
+            **kwargs,
+        )
+
+    def _fetch(self, queryset):
+        rows = list(queryset[:self.per_page + 1])
+
+        return rows[:self.per_page], len(rows) > self.per_page
+
+    def get_keyset_page(self, after=None, before=None):
+        """Возвращает страницу старше курсора after или новее before"""
+        key = decode_cursor(before or after or '')
+        if key is None:
+            rows, has_older = self._fetch(self.object_list)
+            return KeysetPage(rows, self, False, has_older)
+
+        pub_date, post_id = key
+        date_field, id_field = self.key
+        if before:
+            rows, has_newer = self._fetch(
+                self.object_list.filter(
+                    Q(**{f'{date_field}__gt': pub_date})
+                    | Q(**{date_field: pub_date, f'{id_field}__gt': post_id})
+                ).reverse()
+            )
+            if not has_newer:
+                return self.get_keyset_page()
+            rows.reverse()
+            return KeysetPage(rows, self, True, True)
+
+        rows, has_older = self._fetch(
+            self.object_list.filter(
+                Q(**{f'{date_field}__lt': pub_date})
+                | Q(**{date_field: pub_date, f'{id_field}__lt': post_id})
+            )
+        )
+        if not rows:
+            return self.get_keyset_page()
+
+        return KeysetPage(rows, self, True, has_older)
+
+
+def cached_count(queryset, key, timeout=COUNT_CACHE_TIMEOUT):
+    """Источник приблизительного числа записей: COUNT(*) раз в timeout"""
+    return lambda: cache.get_or_set(
+        f'posts_count:{key}',
+        queryset.count,
+        timeout,
+    )
+
+
+class WindowedPaginator(Paginator):
+    """Пагинатор с окном номеров страниц вокруг текущей.
+
+    Общее число записей берётся из count (число или функция), а без
+    него пагинатор не считает записи вовсе: выбирает per_page + 1 строк
+    и по лишней строке узнаёт, есть ли следующая страница. max_pages
+    ограничивает номер страницы без count: дальние страницы стоили бы
+    OFFSET по всей выборке, поэтому вместо них, как и вместо пустых,
+    открывается первая.
+    """
+
+    ELLIPSIS = '…'
+
+    def __init__(
+        self,
+        object_list,
+        per_page,
+        count=None,
+        max_pages=None,
+        **kwargs,
+    ):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count_source = count
+        self._max_pages = max_pages
+        self._probed_pages = 1
+
+    @cached_property
+    def count(self):
+        if callable(self._count_source):
+            return self._count_source()
+
+        return self._count_source
+
+    @property
+    def num_pages(self):
+        if self.count is None:
+            return self._probed_pages
+        if self.count == 0 and not self.allow_empty_first_page:
+            return 0
+
+        return ceil(max(1, self.count - self.orphans) / self.per_page)
+
+    def validate_number(self, number):
+        if self.count is not None:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        if self._max_pages is not None and number > self._max_pages:
+            raise EmptyPage('That page number is too large')
+
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        if self.count is not None:
+            return self._get_page(
+                self.object_list[bottom:bottom + self.per_page],
+                number,
+                self,
+            )
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('That page contains no results')
+        self._probed_pages = number + (len(rows) > self.per_page)
+        if self._max_pages is not None:
+            self._probed_pages = min(self._probed_pages, self._max_pages)
+
+        return self._get_page(rows[:self.per_page], number, self)
+
+    def get_page(self, number):
+        if self.count is None:
+            try:
+                return self.page(number)
+            except (PageNotAnInteger, EmptyPage):
+                return self.page(1)
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            return self.page(1)
+
+    def _get_page(self, *args, **kwargs):
+        page = super()._get_page(*args, **kwargs)
+        page.page_window = list(self.get_elided_page_range(page.number))
+
+        return page
+
+    def get_elided_page_range(
+        self,
+        number=1,
+        on_each_side=PAGE_WINDOW_ON_EACH_SIDE,
+        on_ends=PAGE_WINDOW_ON_ENDS,
+    ):
+        """Номера страниц вокруг number с многоточиями на месте пропусков"""
+        num_pages = self.num_pages
+        if num_pages <= (on_each_side + on_ends) * 2:
+            yield from range(1, num_pages + 1)
+            return
+        if number > on_each_side + on_ends + 2:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(num_pages - on_ends + 1, num_pages + 1)
+        else:
+            yield from range(number + 1, num_pages + 1)
@@ -0,0 +1,104 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .constants import FEED_ORDERING
+from .models import Post
+
+SEARCH_TABLE = 'posts_post_fts'
+# unicode61 не считает ё вариантом е, поэтому ё заменяется и в индексе,
+# и в запросе.
+SEARCH_TEXT = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+SEARCH_SCHEMA = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5('
+    " text, content='posts_post', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2'"
+    ')'
+)
+SEARCH_TRIGGERS = {
+    f'{SEARCH_TABLE}_insert': (
+        f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert'
+        ' AFTER INSERT ON posts_post BEGIN'
+        f' INSERT INTO {SEARCH_TABLE} (rowid, text)'
+        f' VALUES (new.id, {SEARCH_TEXT.format("new.text")});'
+        ' END'
+    ),
+    f'{SEARCH_TABLE}_delete': (
+        f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete'
+        ' AFTER DELETE ON posts_post BEGIN'
+        f' INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, text)'
+        f" VALUES ('delete', old.id, {SEARCH_TEXT.format('old.text')});"
+        ' END'
+    ),
+    f'{SEARCH_TABLE}_update': (
+        f'CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update'
+        ' AFTER UPDATE OF text ON posts_post BEGIN'
+        f' INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, text)'
+        f" VALUES ('delete', old.id, {SEARCH_TEXT.format('old.text')});"
+        f' INSERT INTO {SEARCH_TABLE} (rowid, text)'
+        f' VALUES (new.id, {SEARCH_TEXT.format("new.text")});'
+        ' END'
+    ),
+}
+SEARCH_REBUILD = (
+    f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('delete-all')",
+    f'INSERT INTO {SEARCH_TABLE} (rowid, text)'
+    f' SELECT id, {SEARCH_TEXT.format("text")} FROM posts_post',
+)
+
+
+def install_search_index(using=DEFAULT_DB_ALIAS, **kwargs):
+    """Создаёт индекс FTS5 по текстам постов и триггеры к нему.
+
+    Вызывается после каждого migrate, а не одной миграцией: SQLite
+    меняет схему таблицы, пересоздавая её, и триггеры пропадают вместе
+    со старой таблицей. Если хоть одного триггера не было, индекс
+    перестраивается целиком - правки за это время в нём не отразились.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+            ' AND tbl_name = %s',
+            [Post._meta.db_table],
+        )
+        existing = {name for name, in cursor.fetchall()}
+        if set(SEARCH_TRIGGERS) <= existing:
+            return
+        cursor.execute(SEARCH_SCHEMA)
+        for statement in (*SEARCH_TRIGGERS.values(), *SEARCH_REBUILD):
+            cursor.execute(statement)
+
+
+def get_search_words(query):
+    """Слова запроса без знаков препинания и синтаксиса FTS5"""
+    return re.findall(r'\w+', query.lower().replace('ё', 'е'))
+
+
+def search_posts(query, queryset=None):
+    """Посты, в тексте которых есть все слова запроса.
+
+    В SQLite ищет по индексу FTS5 и ставит первыми самые подходящие по
+    bm25, при равенстве - новые. В других базах ищет через LIKE.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+    words = get_search_words(query)
+    if not words:
+        return queryset.none()
+    if connections[queryset.db].vendor != 'sqlite':
+        for word in words:
+            queryset = queryset.filter(text__icontains=word)
+        return queryset.order_by(*FEED_ORDERING)
+
+    return queryset.extra(
+        tables=[SEARCH_TABLE],
+        where=[
+            f'{SEARCH_TABLE}.rowid = {Post._meta.db_table}.id',
+            f'{SEARCH_TABLE} MATCH %s',
+        ],
+        params=[' '.join(f'"{word}"' for word in words)],
+        order_by=[f'{SEARCH_TABLE}.rank', *FEED_ORDERING],
+    )
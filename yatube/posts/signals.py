@@ -0,0 +1,219 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import thumbnails, timeline
+from .autocomplete import (AUTOCOMPLETE_USER_FIELDS, get_group_entry,
+                           get_user_entry, update_entry)
+from .caching import bump_generations, get_post_scopes
+from .images import read_image_metadata, release_image
+from .models import Comment, Follow, Group, Post, PostTag, User
+from .stats import change_user_stats
+from .tags import delete_empty_tags, sync_post_tags
+from .utils import make_excerpt
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    """Новый пост попадает в ленты подписчиков автора"""
+    if created:
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_post_tags(sender, instance, created, update_fields, **kwargs):
+    """Хештеги нового или изменённого текста попадают в индекс тегов"""
+    if update_fields is None or 'text' in update_fields:
+        sync_post_tags(instance, created=created)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_tags(sender, instance, **kwargs):
+    """Запоминает теги поста: записи индекса удалятся вместе с ним"""
+    instance.tag_ids = list(PostTag.objects.filter(post=instance).values_list(
+        'tag_id',
+        flat=True,
+    ))
+
+
+@receiver(post_delete, sender=Post)
+def delete_post_tags(sender, instance, **kwargs):
+    """Теги, у которых не осталось постов, удаляются"""
+    delete_empty_tags(getattr(instance, 'tag_ids', []))
+
+
+@receiver(post_save, sender=Post)
+def queue_post_thumbnails(sender, instance, **kwargs):
+    """Миниатюры нового или изменённого поста строятся в фоне"""
+    thumbnails.queue_thumbnails(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    """Новый пост увеличивает счётчик постов автора"""
+    if created:
+        change_user_stats(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    """Удалённый пост уменьшает счётчик постов автора"""
+    change_user_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    """Подписка увеличивает счётчики обеих сторон"""
+    if created:
+        change_user_stats(instance.user_id, following_count=1)
+        change_user_stats(instance.author_id, followers_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    """Отписка уменьшает счётчики обеих сторон"""
+    change_user_stats(instance.user_id, following_count=-1)
+    change_user_stats(instance.author_id, followers_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    """После подписки в ленту добавляются последние посты автора"""
+    if created:
+        timeline.backfill_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clean_timeline(sender, instance, **kwargs):
+    """После отписки посты автора убираются из ленты"""
+    timeline.remove_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_profiles(sender, instance, **kwargs):
+    """Подписка меняет счётчики в профилях обеих сторон"""
+    bump_generations(
+        f'profile:{instance.user.username}',
+        f'profile:{instance.author.username}',
+    )
+
+
+@receiver(pre_save, sender=Post)
+def fill_excerpt(sender, instance, **kwargs):
+    """Начало текста для карточек лент обновляется вместе с текстом"""
+    instance.excerpt = make_excerpt(instance.text)
+
+
+@receiver(pre_save, sender=Post)
+def fill_image_metadata(sender, instance, **kwargs):
+    """Размеры и заглушка новой картинки записываются до её сохранения"""
+    image = instance.image
+    if image and image._committed:
+        return
+    instance.image_width = instance.image_height = None
+    instance.image_placeholder = ''
+    if not image:
+        return
+    try:
+        metadata = read_image_metadata(image)
+    except OSError:
+        # Битый файл сохраняется как есть, без размеров и заглушки.
+        return
+    for field, value in metadata.items():
+        setattr(instance, field, value)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_state(sender, instance, **kwargs):
+    """Запоминает группу и картинку поста до правки.
+
+    Ленту прежней группы нужно сбросить, а прежнюю картинку - удалить,
+    если на неё больше никто не ссылается.
+    """
+    instance.previous_group_slug, instance.previous_image = (
+        instance.pk and Post.objects.filter(pk=instance.pk).values_list(
+            'group__slug',
+            'image',
+        ).first()
+    ) or (None, None)
+
+
+@receiver(post_save, sender=Post)
+def release_previous_image(sender, instance, **kwargs):
+    """Заменённая или убранная картинка удаляется без последних ссылок"""
+    previous_image = getattr(instance, 'previous_image', None)
+    if previous_image != instance.image.name:
+        release_image(previous_image)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    """Картинка удалённого поста удаляется без последних ссылок"""
+    release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    """Изменение поста сбрасывает кеш лент, в которые он попадает"""
+    bump_generations(*get_post_scopes(
+        instance,
+        group_slugs=[getattr(instance, 'previous_group_slug', None)],
+    ))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, **kwargs):
+    """Изменение группы сбрасывает её ленту и ленты с её постами"""
+    authors = Post.objects.filter(group=instance).values_list(
+        'author__username',
+        flat=True,
+    ).distinct()
+    bump_generations(
+        'index',
+        f'group:{instance.slug}',
+        *(f'profile:{username}' for username in authors),
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_post_comments(sender, instance, **kwargs):
+    """Новый или удалённый комментарий сбрасывает кеш страницы поста"""
+    bump_generations(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=User)
+def update_user_suggestion(sender, instance, update_fields, **kwargs):
+    """Новый или переименованный пользователь попадает в подсказки.
+
+    Сохранения, не трогающие имён (например, last_login при входе),
+    индекс не меняют.
+    """
+    if update_fields is None or AUTOCOMPLETE_USER_FIELDS & set(update_fields):
+        update_entry(*get_user_entry(
+            instance.pk,
+            instance.username,
+            instance.first_name,
+            instance.last_name,
+        ))
+
+
+@receiver(post_save, sender=Group)
+def update_group_suggestion(sender, instance, **kwargs):
+    """Новая или изменённая группа попадает в подсказки"""
+    update_entry(*get_group_entry(instance.pk, instance.slug, instance.title))
+
+
+@receiver(post_delete, sender=User)
+def remove_user_suggestion(sender, instance, **kwargs):
+    """Удалённый пользователь пропадает из подсказок"""
+    update_entry(('user', instance.pk))
+
+
+@receiver(post_delete, sender=Group)
+def remove_group_suggestion(sender, instance, **kwargs):
+    """Удалённая группа пропадает из подсказок"""
+    update_entry(('group', instance.pk))
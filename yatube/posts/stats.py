@@ -0,0 +1,39 @@
+from django.db.models import F
+
+from .models import Follow, Post, UserStats
+
+
+def recount_user_stats(user_id):
+    """Пересчитывает счётчики пользователя по исходным таблицам"""
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id,
+            ).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id,
+            ).count(),
+        },
+    )
+
+    return stats
+
+
+def get_user_stats(user):
+    """Счётчики пользователя; при первом обращении строка создаётся"""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return recount_user_stats(user.pk)
+
+
+def change_user_stats(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя на deltas.
+
+    Строки ещё нет - ничего не делаем: её посчитает get_user_stats.
+    """
+    UserStats.objects.filter(user_id=user_id).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
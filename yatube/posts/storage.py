@@ -0,0 +1,109 @@
+import hashlib
+import os
+import posixpath
+import re
+from uuid import uuid4
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+from .constants import MEDIA_SHARD_DEPTH, MEDIA_SHARD_WIDTH
+
+TEMP_PREFIX = '.upload-'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла - хеш его содержимого.
+
+    Файл 'posts/photo.jpg' ложится в 'posts/ab/cd/<sha256>.jpg':
+    вложенные каталоги не дают одной папке разрастись, а одинаковые
+    загрузки получают одно имя и хранятся один раз. Пишется файл через
+    временный файл и os.replace, поэтому две одновременные загрузки
+    одной картинки не мешают друг другу. Удалять файл можно только
+    когда на него не ссылается ни один пост - см. images.release_image.
+    """
+
+    def get_content_name(self, name, content):
+        """Имя файла по хешу содержимого в каталоге исходного имени"""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        shards = [
+            hexdigest[index:index + MEDIA_SHARD_WIDTH]
+            for index in range(
+                0,
+                MEDIA_SHARD_DEPTH * MEDIA_SHARD_WIDTH,
+                MEDIA_SHARD_WIDTH,
+            )
+        ]
+        extension = os.path.splitext(name)[1].lower()
+
+        return posixpath.join(
+            posixpath.dirname(name),
+            *shards,
+            hexdigest + extension,
+        )
+
+    def is_content_name(self, name):
+        """Лежит ли файл уже по имени из хеша содержимого"""
+        shard = rf'[0-9a-f]{{{MEDIA_SHARD_WIDTH}}}/'
+        return bool(re.search(
+            rf'(^|/){shard * MEDIA_SHARD_DEPTH}[0-9a-f]{{64}}(\.\w+)?$',
+            name,
+        ))
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        return super().save(
+            self.get_content_name(name, content),
+            content,
+            max_length,
+        )
+
+    def get_available_name(self, name, max_length=None):
+        # Занятое имя значит, что такой файл уже есть: его и используем.
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            # Свежее время изменения не даёт gc_media удалить файл,
+            # на который вот-вот сошлётся новый пост.
+            os.utime(full_path)
+            return name
+        directory = os.path.dirname(full_path)
+        if self.directory_permissions_mode is None:
+            os.makedirs(directory, exist_ok=True)
+        else:
+            old_umask = os.umask(0)
+            try:
+                os.makedirs(
+                    directory,
+                    self.directory_permissions_mode,
+                    exist_ok=True,
+                )
+            finally:
+                os.umask(old_umask)
+        temp_path = os.path.join(directory, f'{TEMP_PREFIX}{uuid4().hex}')
+        descriptor = os.open(temp_path, self.OS_OPEN_FLAGS, 0o666)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        return name
+
+
+post_image_storage = ContentAddressedStorage()
@@ -0,0 +1,62 @@
+import re
+
+from .constants import TAG_MAX_LENGTH
+from .models import PostTag, Tag
+
+# Решётка внутри слова, ссылки или HTML-сущности (&#39;) - не хештег.
+HASHTAG_RE = re.compile(rf'(?<![\w/&#])#(\w{{1,{TAG_MAX_LENGTH}}})\b')
+
+
+def extract_tags(text):
+    """Имена хештегов текста в нижнем регистре, без повторов"""
+    return {name.lower() for name in HASHTAG_RE.findall(text)}
+
+
+def delete_empty_tags(tag_ids):
+    """Удаляет теги из tag_ids, у которых не осталось постов.
+
+    Иначе лента мёртвого тега отдавала бы пустую страницу вместо 404.
+    """
+    if tag_ids:
+        Tag.objects.filter(id__in=tag_ids, post_tags__isnull=True).delete()
+
+
+def sync_post_tags(post, created=False):
+    """Приводит инвертированный индекс к хештегам текста поста.
+
+    Меняются только разошедшиеся записи: убранные теги удаляются,
+    новые добавляются, остальные не трогаются. У нового поста записей
+    ещё нет, и их не ищут.
+    """
+    names = extract_tags(post.text)
+    current = {} if created else {
+        name: (entry_id, tag_id)
+        for name, entry_id, tag_id in PostTag.objects.filter(
+            post=post,
+        ).values_list('tag__name', 'id', 'tag_id')
+    }
+    removed = [
+        entry for name, entry in current.items() if name not in names
+    ]
+    if removed:
+        PostTag.objects.filter(
+            id__in=[entry_id for entry_id, _ in removed],
+        ).delete()
+        delete_empty_tags([tag_id for _, tag_id in removed])
+    added = names - current.keys()
+    if not added:
+        return
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in added],
+        ignore_conflicts=True,
+    )
+    PostTag.objects.bulk_create(
+        [
+            PostTag(post=post, tag_id=tag_id, pub_date=post.pub_date)
+            for tag_id in Tag.objects.filter(name__in=added).values_list(
+                'id',
+                flat=True,
+            )
+        ],
+        ignore_conflicts=True,
+    )
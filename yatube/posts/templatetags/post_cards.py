@@ -0,0 +1,64 @@
+from hashlib import md5
+
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from ..constants import POST_CARD_TIMEOUT
+
+register = template.Library()
+
+
+def get_card_key(post, hide_author, hide_group):
+    """Ключ карточки: id поста и версия из всего, что в неё попадает.
+
+    Версия меняется вместе с началом текста, картинкой, группой и именем
+    автора, поэтому старые карточки не нужно удалять - они просто
+    перестают запрашиваться и вытесняются по таймауту.
+    """
+    group = post.group
+    version = md5('\0'.join(map(str, (
+        post.card_excerpt,
+        post.image.name,
+        post.image_width,
+        post.image_height,
+        post.image_placeholder,
+        post.pub_date.isoformat(),
+        post.author.username,
+        post.author.get_full_name(),
+        group.slug if group else '',
+        group.title if group else '',
+    ))).encode()).hexdigest()
+
+    return f'post_card:{post.pk}:{int(hide_author)}{int(hide_group)}:{version}'
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Пары (пост, html карточки) для страницы ленты.
+
+    Карточки читаются из кеша одним get_many, недостающие рендерятся
+    и сохраняются одним set_many. Ссылка «Редактировать» зависит от
+    зрителя и в карточку не входит. Карточка с заглушкой вместо ещё не
+    построенной миниатюры не кешируется.
+    """
+    hide_author = bool(context.get('author'))
+    hide_group = bool(context.get('group'))
+    keys = [get_card_key(post, hide_author, hide_group) for post in posts]
+    cached = cache.get_many(keys)
+    rendered = {}
+    cards = []
+    for post, key in zip(posts, keys):
+        card = cached.get(key)
+        if card is None:
+            card = render_to_string(
+                'posts/includes/post_card.html',
+                {'post': post, 'author': hide_author, 'group': hide_group},
+            )
+            if not getattr(post, 'thumbnail_pending', False):
+                rendered[key] = card
+        cards.append((post, mark_safe(card)))
+    cache.set_many(rendered, POST_CARD_TIMEOUT)
+
+    return cards
@@ -0,0 +1,19 @@
+from django import template
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+from ..tags import HASHTAG_RE
+
+register = template.Library()
+
+
+@register.filter(is_safe=True)
+def link_hashtags(html):
+    """Превращает хештеги в уже экранированном тексте в ссылки на ленты"""
+    return mark_safe(HASHTAG_RE.sub(
+        lambda match: (
+            f'<a href="{reverse("posts:tag_posts", args=[match[1].lower()])}"'
+            f'>{match[0]}</a>'
+        ),
+        html,
+    ))
@@ -0,0 +1,36 @@
+from django import template
+
+from .. import metrics
+from ..thumbnails import (get_ready_thumbnail, get_renditions, has_failed,
+                          queue_thumbnails)
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, name):
+    """Готовая миниатюра name картинки поста или None.
+
+    Берёт миниатюру из post.thumbnails, если страницу заранее
+    разобрал prefetch_thumbnails, иначе ищет её в kvstore. Пока
+    миниатюры нет, пост помечается thumbnail_pending, чтобы его
+    карточку не закешировали с заглушкой, а построение ставится в пул.
+    Картинку, миниатюры которой недавно не построились, в пул снова
+    не ставит.
+    Для миниатюр, которые здесь не строятся (WebP без поддержки в
+    Pillow), сразу возвращает None.
+    """
+    if not post.image or name not in get_renditions():
+        return None
+    prefetched = getattr(post, 'thumbnails', {})
+    if name in prefetched:
+        thumbnail = prefetched[name]
+    else:
+        thumbnail = get_ready_thumbnail(post.image, name)
+    if thumbnail is None:
+        post.thumbnail_pending = True
+        metrics.incr('thumbnails.placeholders')
+        if not has_failed(post.image):
+            queue_thumbnails(post)
+
+    return thumbnail
@@ -0,0 +1,168 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..autocomplete import (GENERATION_KEY, PrefixIndex, get_generation,
+                            get_group_entry, get_suggestions, get_user_entry,
+                            publish_change)
+from ..metrics import get_metrics
+from ..models import Group
+
+User = get_user_model()
+
+
+def run_now(func):
+    """Замена transaction.on_commit: в TestCase коммита не бывает"""
+    func()
+
+
+def labels(results):
+    return [result['label'] for result in results]
+
+
+class PrefixIndexTests(TestCase):
+    """Проверка поиска по префиксу в отсортированном массиве"""
+
+    def test_search(self):
+        """Ищется начало любого ключа, без регистра, ё равна е"""
+        index = PrefixIndex([
+            get_user_entry(1, 'leo', 'Лев', 'Толстой'),
+            get_user_entry(2, 'fedor', 'Фёдор', 'Достоевский'),
+            get_user_entry(3, 'tolstaya', '', ''),
+            get_group_entry(1, 'tolstoy-fans', 'Читатели Толстого'),
+        ])
+        self.assertEqual(labels(index.search('ТОЛСТ')), [
+            'Читатели Толстого',
+            'Лев Толстой',
+        ])
+        self.assertEqual(labels(index.search('федор д')), [
+            'Фёдор Достоевский',
+        ])
+        self.assertEqual(labels(index.search('tolst')), [
+            'tolstaya',
+            'Читатели Толстого',
+        ])
+        self.assertEqual(len(index.search('t', limit=1)), 1)
+        self.assertEqual(index.search('я'), [])
+
+    def test_put(self):
+        """Подсказку можно заменить и удалить"""
+        index = PrefixIndex([get_user_entry(1, 'leo', 'Лев', 'Толстой')])
+        self.assertFalse(index.put(
+            *get_user_entry(1, 'leo', 'Лев', 'Толстой'),
+        ))
+        self.assertTrue(index.put(*get_user_entry(1, 'leo', 'Лев', 'Т.')))
+        self.assertEqual(index.search('толст'), [])
+        self.assertTrue(index.put(('user', 1)))
+        self.assertEqual(index.search('л'), [])
+        self.assertEqual(index.keys, [])
+
+
+class AutocompleteTests(TestCase):
+    """Проверка подсказок профилей и групп"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='leo',
+            first_name='Лев',
+            last_name='Толстой',
+        )
+        cls.group = Group.objects.create(
+            title='Любители прозы',
+            slug='prose',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        # Пустой кеш - новое поколение, индекс строится заново.
+        cache.clear()
+
+    def test_endpoint_does_not_touch_database(self):
+        """Построенный индекс отвечает без запросов к базе"""
+        get_suggestions('л')
+        with self.assertNumQueries(0):
+            response = Client().get(reverse('posts:autocomplete'), {
+                'q': 'Л',
+            })
+        self.assertEqual(response.json(), {'results': [
+            {
+                'type': 'user',
+                'value': 'leo',
+                'label': 'Лев Толстой',
+                'url': reverse('posts:profile', kwargs={'username': 'leo'}),
+            },
+            {
+                'type': 'group',
+                'value': 'prose',
+                'label': 'Любители прозы',
+                'url': reverse('posts:group_list', kwargs={'slug': 'prose'}),
+            },
+        ]})
+        self.assertEqual(
+            Client().get(reverse('posts:autocomplete')).json(),
+            {'results': []},
+        )
+
+    @mock.patch('posts.autocomplete.transaction.on_commit', run_now)
+    def test_signals_update_index(self):
+        """Новые, изменённые и удалённые записи сразу видны в подсказках"""
+        get_suggestions('л')
+        author = User.objects.create_user(username='anna')
+        self.assertEqual(labels(get_suggestions('an')), ['anna'])
+        author.first_name = 'Анна'
+        author.last_name = 'Ахматова'
+        author.save()
+        self.assertEqual(labels(get_suggestions('ахм')), ['Анна Ахматова'])
+        User.objects.filter(pk=author.pk).delete()
+        self.assertEqual(get_suggestions('ахм'), [])
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Поэзия'
+        group.save()
+        self.assertEqual(labels(get_suggestions('п')), ['Поэзия'])
+        with self.assertNumQueries(0):
+            get_suggestions('п')
+
+    @mock.patch('posts.autocomplete.transaction.on_commit', run_now)
+    def test_login_keeps_generation(self):
+        """Сохранение без смены имён не заставляет перестраивать индекс"""
+        get_suggestions('л')
+        generation = cache.get(GENERATION_KEY)
+        Client().force_login(self.user)
+        self.user.save()
+        self.assertEqual(cache.get(GENERATION_KEY), generation)
+
+    def test_other_process_changes_are_picked_up(self):
+        """Новое поколение в общем кеше перестраивает индекс процесса"""
+        get_suggestions('л')
+        User.objects.create_user(username='boris')
+        self.assertEqual(get_suggestions('bor'), [])
+        cache.set(GENERATION_KEY, 'changed', None)
+        self.assertEqual(labels(get_suggestions('bor')), ['boris'])
+
+    def test_other_process_changes_are_replayed(self):
+        """Изменения других процессов доигрываются из журнала без базы"""
+        get_suggestions('л')
+        publish_change(*get_user_entry(100, 'vera', 'Вера', 'Фигнер'))
+        publish_change(*get_group_entry(self.group.pk, 'prose', 'Проза'))
+        with self.assertNumQueries(0):
+            self.assertEqual(labels(get_suggestions('вер')), ['Вера Фигнер'])
+            self.assertEqual(labels(get_suggestions('про')), ['Проза'])
+        self.assertEqual(get_metrics(['autocomplete.rebuilds']), {
+            'autocomplete.rebuilds': 1,
+        })
+
+    def test_gap_in_changes_rebuilds_index(self):
+        """Потерянное изменение в журнале перестраивает индекс"""
+        get_suggestions('л')
+        User.objects.create_user(username='boris')
+        publish_change(*get_user_entry(100, 'vera', 'Вера', 'Фигнер'))
+        publish_change(*get_user_entry(101, 'olga', 'Ольга', ''))
+        cache.delete(f'autocomplete:{get_generation()}:1')
+        self.assertEqual(labels(get_suggestions('bor')), ['boris'])
+        self.assertEqual(get_metrics(['autocomplete.rebuilds']), {
+            'autocomplete.rebuilds': 2,
+        })
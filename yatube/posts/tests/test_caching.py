@@ -0,0 +1,132 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from ..caching import bump_generations, cache_feed, get_response_key
+from ..metrics import get_metrics
+from ..models import Follow, Post
+
+User = get_user_model()
+
+SCOPES = ('test-feed',)
+
+
+class CacheFeedTests(SimpleTestCase):
+    """Проверка кеширования лент с фоновым обновлением"""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.request = RequestFactory().get('/feed/')
+
+    def view(self, request):
+        self.calls += 1
+        return HttpResponse(f'render {self.calls}')
+
+    def test_fresh_entry_is_a_hit(self):
+        """Свежая запись отдаётся без вызова вью"""
+        view = cache_feed(lambda: SCOPES)(self.view)
+        view(self.request)
+        response = view(self.request)
+        self.assertEqual(response.content, b'render 1')
+        self.assertEqual(get_metrics(['feed_cache.hits']), {
+            'feed_cache.hits': 1,
+        })
+
+    def test_stale_entry_is_served_while_locked(self):
+        """Пока другой процесс обновляет запись, отдаётся устаревшая"""
+        view = cache_feed(lambda: SCOPES, soft_timeout=0)(self.view)
+        view(self.request)
+        cache.add(f'{get_response_key(self.request, SCOPES)}:lock', 1)
+        response = view(self.request)
+        self.assertEqual(response.content, b'render 1')
+        self.assertEqual(get_metrics(['feed_cache.stale']), {
+            'feed_cache.stale': 1,
+        })
+
+    def test_stale_entry_is_rebuilt_by_lock_owner(self):
+        """Запрос, взявший блокировку, строит страницу заново"""
+        view = cache_feed(lambda: SCOPES, soft_timeout=0)(self.view)
+        view(self.request)
+        response = view(self.request)
+        self.assertEqual(response.content, b'render 2')
+        self.assertFalse(
+            cache.get(f'{get_response_key(self.request, SCOPES)}:lock'),
+        )
+
+    def test_new_generation_is_a_miss(self):
+        """Сдвиг поколения сразу делает запись недоступной"""
+        view = cache_feed(lambda: SCOPES)(self.view)
+        view(self.request)
+        bump_generations(*SCOPES)
+        self.assertEqual(view(self.request).content, b'render 2')
+        self.assertEqual(get_metrics(['feed_cache.misses']), {
+            'feed_cache.misses': 2,
+        })
+
+
+class HolePunchingTests(TestCase):
+    """Одна закешированная страница для гостей и пользователей"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Тестовый пост')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.PROFILE = reverse('posts:profile', args=[cls.author.username])
+        cls.DETAIL = reverse('posts:post_detail', args=[cls.post.pk])
+        cls.EDIT = reverse('posts:post_edit', args=[cls.post.pk])
+        cls.INDEX = reverse('posts:index')
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_users_share_the_guest_page(self):
+        """Пользователь получает закешированную гостем страницу"""
+        self.client.get(self.PROFILE)
+        response = self.reader_client.get(self.PROFILE)
+        self.assertNotIn('page_obj', response.context)
+        self.assertEqual(get_metrics(['feed_cache.hits']), {
+            'feed_cache.hits': 1,
+        })
+        self.assertContains(response, 'Выйти')
+        self.assertContains(response, 'Отписаться')
+        self.assertNotContains(response, self.EDIT)
+        self.assertNotContains(response, '<!--hole:')
+
+    def test_guest_does_not_get_user_controls(self):
+        """Страница пользователя не отдаёт гостю его шапку и кнопки"""
+        self.reader_client.get(self.PROFILE)
+        response = self.client.get(self.PROFILE)
+        self.assertContains(response, 'Войти')
+        self.assertNotContains(response, 'Выйти')
+        self.assertContains(response, 'Подписаться')
+
+    def test_author_controls_are_filled_on_cached_page(self):
+        """Автор видит ссылку правки и форму комментария с csrf"""
+        self.reader_client.get(self.DETAIL)
+        response = self.author_client.get(self.DETAIL)
+        self.assertNotIn('post', response.context)
+        self.assertContains(response, self.EDIT)
+        self.assertNotContains(response, 'Подписаться')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertEqual(response['Vary'], 'Cookie')
+
+    def test_feed_switcher_follows_the_viewer(self):
+        """Переключатель лент есть у пользователя и нет у гостя"""
+        self.client.get(self.INDEX)
+        self.assertContains(
+            self.reader_client.get(self.INDEX),
+            'Избранные авторы',
+        )
+        cache.clear()
+        self.reader_client.get(self.INDEX)
+        self.assertNotContains(self.client.get(self.INDEX), 'Избранные авторы')
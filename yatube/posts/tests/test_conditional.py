@@ -0,0 +1,158 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    """Проверка ответов 304 Not Modified для лент и страницы поста"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+        cls.INDEX = reverse('posts:index')
+        cls.GROUP_LIST = reverse('posts:group_list', args=[cls.group.slug])
+        cls.PROFILE = reverse('posts:profile', args=[cls.author.username])
+        cls.DETAIL = reverse('posts:post_detail', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_again(self, client, url):
+        """Повторный запрос с валидаторами из первого ответа"""
+        response = client.get(url)
+        headers = {'HTTP_IF_NONE_MATCH': response['ETag']}
+        if response.has_header('Last-Modified'):
+            headers['HTTP_IF_MODIFIED_SINCE'] = response['Last-Modified']
+        return client.get(url, **headers)
+
+    def get_since(self, client, url, response):
+        """Запрос только с If-Modified-Since из прошлого ответа"""
+        return client.get(
+            url,
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+
+    def test_unchanged_pages_are_not_modified(self):
+        """Повторный запрос к неизменной странице получает 304"""
+        for client in (self.client, self.reader_client):
+            for url in (
+                self.INDEX,
+                self.GROUP_LIST,
+                self.PROFILE,
+                self.DETAIL,
+            ):
+                with self.subTest(url=url):
+                    response = self.get_again(client, url)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response.content, b'')
+
+    def test_last_modified_alone_is_enough(self):
+        """Клиент только с If-Modified-Since тоже получает 304"""
+        response = self.client.get(self.INDEX)
+        response = self.get_since(self.client, self.INDEX, response)
+        self.assertEqual(response.status_code, 304)
+
+    def test_deletions_update_last_modified(self):
+        """Удаление поста и комментария сдвигает Last-Modified"""
+        post = Post.objects.create(author=self.author, text='Удаляемый пост')
+        comment = Comment.objects.create(
+            post=self.post,
+            author=self.reader,
+            text='Комментарий',
+        )
+        changes = {
+            self.INDEX: post.delete,
+            self.DETAIL: comment.delete,
+        }
+        for url, change in changes.items():
+            with self.subTest(url=url):
+                cache.clear()
+                response = self.client.get(url)
+                # Last-Modified точен до секунды: удаление - позже.
+                with mock.patch(
+                    'posts.caching.time.time',
+                    return_value=time.time() + 1,
+                ):
+                    change()
+                response = self.get_since(self.client, url, response)
+                self.assertEqual(response.status_code, 200)
+
+    def test_user_pages_have_no_last_modified(self):
+        """Вход не даёт 304 по дате: страница пользователя другая"""
+        response = self.client.get(self.INDEX)
+        self.assertFalse(self.reader_client.get(self.INDEX).has_header(
+            'Last-Modified',
+        ))
+        response = self.get_since(self.reader_client, self.INDEX, response)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Выйти')
+
+    def test_edit_updates_last_modified(self):
+        """Правка поста сдвигает updated_at и Last-Modified ленты"""
+        response = self.client.get(self.PROFILE)
+        post = Post.objects.get(pk=self.post.pk)
+        updated_at = post.updated_at
+        post.text = 'Изменённый пост'
+        post.save()
+        post.refresh_from_db()
+        self.assertGreater(post.updated_at, updated_at)
+        self.assertEqual(post.pub_date, self.post.pub_date)
+        response = self.client.get(
+            self.PROFILE,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_changes_invalidate_validators(self):
+        """Комментарий, удаление поста и подписка меняют ETag"""
+        post = Post.objects.create(author=self.author, text='Удаляемый пост')
+        changes = {
+            self.DETAIL: lambda: Comment.objects.create(
+                post=self.post,
+                author=self.reader,
+                text='Комментарий',
+            ),
+            self.INDEX: post.delete,
+            self.PROFILE: lambda: Follow.objects.create(
+                user=self.reader,
+                author=self.author,
+            ),
+        }
+        for url, change in changes.items():
+            with self.subTest(url=url):
+                etag = self.reader_client.get(url)['ETag']
+                change()
+                response = self.reader_client.get(
+                    url,
+                    HTTP_IF_NONE_MATCH=etag,
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_viewer(self):
+        """Гость и пользователь получают разные ETag"""
+        self.assertNotEqual(
+            self.client.get(self.INDEX)['ETag'],
+            self.reader_client.get(self.INDEX)['ETag'],
+        )
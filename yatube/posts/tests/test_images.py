@@ -0,0 +1,154 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..constants import IMAGE_MAX_SIZE
+from ..images import ingest_image, make_placeholder
+from ..metrics import get_metrics
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+ORIENTATION = 0x0112
+ROTATED_90 = 6
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def make_upload(name, size, image_format, mode='RGB', orientation=None):
+    """Загруженный файл с картинкой нужного размера и формата"""
+    image = Image.new(mode, size, 'red')
+    output = BytesIO()
+    options = {}
+    if orientation:
+        exif = Image.Exif()
+        exif[ORIENTATION] = orientation
+        options['exif'] = exif.tobytes()
+    image.save(output, image_format, **options)
+
+    return SimpleUploadedFile(name, output.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class IngestImageTests(TestCase):
+    """Проверка подготовки загруженных картинок к хранению"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_large_photo_is_downscaled_rotated_and_stripped(self):
+        """Фото уменьшается, поворачивается по EXIF и теряет метаданные"""
+        uploaded = make_upload(
+            'photo.jpeg',
+            (4000, 3000),
+            'JPEG',
+            orientation=ROTATED_90,
+        )
+        ingested = ingest_image(uploaded)
+        image = Image.open(ingested)
+        self.assertEqual(ingested.name, 'photo.jpg')
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (1440, IMAGE_MAX_SIZE[1]))
+        self.assertNotIn('exif', image.info)
+        metrics = get_metrics(['images.bytes_uploaded', 'images.ingested'])
+        self.assertEqual(metrics['images.ingested'], 1)
+        self.assertEqual(metrics['images.bytes_uploaded'], uploaded.size)
+
+    def test_transparency_is_kept(self):
+        """Картинка с прозрачностью пережимается в PNG"""
+        ingested = ingest_image(
+            make_upload('logo.webp', (3000, 100), 'PNG', mode='RGBA'),
+        )
+        self.assertEqual(ingested.name, 'logo.png')
+        self.assertEqual(Image.open(ingested).mode, 'RGBA')
+
+    def test_small_clean_image_is_stored_as_is(self):
+        """Картинку, которая после пережатия выросла бы, не трогают"""
+        uploaded = SimpleUploadedFile('small.gif', SMALL_GIF)
+        self.assertIs(ingest_image(uploaded), uploaded)
+
+    def test_post_form_ingests_new_image(self):
+        """Форма поста сохраняет уже уменьшенную картинку"""
+        author = User.objects.create_user(username='author')
+        client = Client()
+        client.force_login(author)
+        client.post(reverse('posts:post_create'), {
+            'text': 'Пост с большой картинкой',
+            'image': make_upload('photo.png', (3000, 3000), 'PNG'),
+        })
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        self.assertEqual(Image.open(post.image).size, IMAGE_MAX_SIZE)
+        self.assertEqual(
+            (post.image_width, post.image_height),
+            IMAGE_MAX_SIZE,
+        )
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/jpeg;base64,'),
+        )
+
+    def test_placeholder_is_tiny(self):
+        """Заглушка весит меньше килобайта даже для большого фото"""
+        placeholder = make_placeholder(
+            make_upload('photo.jpeg', (4000, 3000), 'JPEG'),
+        )
+        self.assertLess(len(placeholder), 1024)
+
+    def test_pending_image_shows_placeholder_with_dimensions(self):
+        """Пока миниатюр нет, на странице заглушка с размерами"""
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(
+            author=author,
+            text='Пост с картинкой',
+            image=make_upload('photo.png', (300, 200), 'PNG'),
+        )
+        self.assertEqual((post.image_width, post.image_height), (300, 200))
+        Post.objects.filter(pk=post.pk).update(
+            image_placeholder='data:image/jpeg;base64,AAAA',
+        )
+        with self.settings(POSTS_THUMBNAIL_WORKERS=2):
+            response = Client().get(reverse(
+                'posts:post_detail',
+                kwargs={'post_id': post.pk},
+            ))
+        self.assertContains(
+            response,
+            'src="data:image/jpeg;base64,AAAA" width="300" height="200"',
+        )
+
+    def test_backfill_fills_old_posts(self):
+        """Команда заполняет размеры и заглушку у старых постов"""
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(
+            author=author,
+            text='Старый пост',
+            image=make_upload('old.png', (300, 200), 'PNG'),
+        )
+        Post.objects.filter(pk=post.pk).update(
+            image_width=None,
+            image_height=None,
+        )
+        call_command('backfill_images', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (300, 200))
+        self.assertTrue(post.image_placeholder)
@@ -0,0 +1,28 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from .. import metrics
+
+
+@override_settings(POSTS_METRICS_FLUSH_INTERVAL=60)
+class MetricsTests(SimpleTestCase):
+    """Проверка счётчиков, которые копятся в памяти процесса"""
+
+    def setUp(self):
+        metrics.flush()
+        cache.clear()
+
+    def test_increments_are_flushed_in_batches(self):
+        """Приращения не пишутся в общий кеш по одному"""
+        for _ in range(3):
+            metrics.incr('test.events')
+        self.assertIsNone(cache.get('metrics:test.events'))
+        self.assertEqual(metrics.get_metrics(['test.events']), {
+            'test.events': 3,
+        })
+        metrics.incr('test.events', 2)
+        with mock.patch('posts.metrics.time.monotonic', return_value=10 ** 9):
+            metrics.incr('test.events')
+        self.assertEqual(cache.get('metrics:test.events'), 6)
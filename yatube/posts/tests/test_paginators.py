@@ -0,0 +1,60 @@
+from django.test import SimpleTestCase
+
+from ..paginators import WindowedPaginator
+
+OBJECTS_COUNT = 500
+PER_PAGE = 10
+
+
+class WindowedPaginatorTests(SimpleTestCase):
+    """Проверка пагинатора с окном страниц"""
+
+    def setUp(self):
+        self.objects = list(range(OBJECTS_COUNT))
+
+    def test_window_is_elided_around_current_page(self):
+        """Окно содержит края, соседей текущей страницы и многоточия"""
+        paginator = WindowedPaginator(
+            self.objects,
+            PER_PAGE,
+            count=OBJECTS_COUNT,
+        )
+        page = paginator.get_page(25)
+        ellipsis = paginator.ELLIPSIS
+        self.assertEqual(
+            page.page_window,
+            [1, ellipsis, 23, 24, 25, 26, 27, ellipsis, 50],
+        )
+        self.assertEqual(list(page), self.objects[240:250])
+
+    def test_count_source_may_be_callable(self):
+        """Число записей можно передать функцией"""
+        paginator = WindowedPaginator(
+            self.objects,
+            PER_PAGE,
+            count=lambda: OBJECTS_COUNT,
+        )
+        self.assertEqual(paginator.num_pages, OBJECTS_COUNT // PER_PAGE)
+
+    def test_probe_mode_without_count(self):
+        """Без count следующая страница определяется по лишней строке"""
+        paginator = WindowedPaginator(self.objects, PER_PAGE)
+        page = paginator.get_page(3)
+        self.assertIsNone(paginator.count)
+        self.assertTrue(page.has_next())
+        self.assertEqual(page.page_window, [1, 2, 3, 4])
+        last_page = paginator.get_page(OBJECTS_COUNT // PER_PAGE)
+        self.assertFalse(last_page.has_next())
+        self.assertEqual(
+            paginator.get_page(OBJECTS_COUNT).number,
+            1,
+        )
+
+    def test_probe_mode_page_number_is_capped(self):
+        """Без count страницы дальше max_pages открывают первую без OFFSET"""
+        paginator = WindowedPaginator(self.objects, PER_PAGE, max_pages=2)
+        self.assertFalse(paginator.get_page(2).has_next())
+        for number in (3, 10 ** 23):
+            with self.subTest(number=number):
+                page = paginator.get_page(number)
+                self.assertEqual(page.number, 1)
@@ -0,0 +1,128 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..caching import bump_generations
+from ..constants import POSTS_LIMIT, POST_EXCERPT_LENGTH
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardCacheTests(TestCase):
+    """Проверка кеширования карточек постов в лентах"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Test_group',
+            slug='test-slug',
+            description='Test_description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        cls.GROUP_LIST = reverse(
+            'posts:group_list',
+            kwargs={'slug': cls.group.slug},
+        )
+        cls.EDIT = reverse('posts:post_edit', kwargs={'post_id': cls.post.id})
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    def test_cached_card_keeps_edit_link_per_viewer(self):
+        """Ссылка на редактирование не попадает в общую карточку"""
+        guest_content = self.client.get(self.GROUP_LIST).content.decode()
+        author_content = self.author_client.get(
+            self.GROUP_LIST,
+        ).content.decode()
+        self.assertNotIn(self.EDIT, guest_content)
+        self.assertIn(self.EDIT, author_content)
+        self.assertIn(self.post.text, author_content)
+
+    def test_card_changes_with_post_and_author_name(self):
+        """Правка поста и имени автора сразу видна в карточке"""
+        self.client.get(self.GROUP_LIST)
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Новый текст',
+            excerpt='Новый текст',
+        )
+        User.objects.filter(pk=self.user.pk).update(
+            first_name='Лев',
+            last_name='Толстой',
+        )
+        bump_generations(f'group:{self.group.slug}')
+        content = self.client.get(self.GROUP_LIST).content.decode()
+        self.assertIn('Новый текст', content)
+        self.assertIn('Лев Толстой', content)
+
+    def test_feeds_load_only_card_columns(self):
+        """Ленты не читают пароли, описания групп и полные тексты"""
+        with CaptureQueriesContext(connection) as queries:
+            for url in (
+                reverse('posts:index'),
+                self.GROUP_LIST,
+                reverse('posts:profile', kwargs={'username': 'author'}),
+            ):
+                self.assertContains(self.client.get(url), self.post.text)
+        # Полный текст читается, только если начало поста пустое.
+        sql = ' '.join(
+            query['sql'] for query in queries
+            if 'FROM "posts_post"' in query['sql']
+        ).replace('SUBSTR("posts_post"."text"', '')
+        self.assertIn('"posts_post"."excerpt"', sql)
+        for column in (
+            '"auth_user"."password"',
+            '"auth_user"."email"',
+            '"posts_group"."description"',
+            '"posts_post"."text"',
+        ):
+            self.assertNotIn(column, sql)
+
+    def test_long_post_card_shows_excerpt(self):
+        """Длинный пост в ленте обрезан по слову, целиком - на странице"""
+        words = ['слово'] * POST_EXCERPT_LENGTH
+        post = Post.objects.create(author=self.user, text=' '.join(words))
+        self.assertLessEqual(len(post.excerpt), POST_EXCERPT_LENGTH + 1)
+        self.assertTrue(post.excerpt.endswith('слово…'))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.excerpt)
+        self.assertNotContains(response, post.text)
+        self.assertContains(response, reverse(
+            'posts:post_detail',
+            kwargs={'post_id': post.pk},
+        ))
+        self.assertContains(
+            self.client.get(reverse(
+                'posts:post_detail',
+                kwargs={'post_id': post.pk},
+            )),
+            post.text,
+        )
+
+    def test_feed_queries_do_not_grow_with_posts(self):
+        """Карточки не дочитывают отложенные колонки по одной на пост.
+
+        Посты из bulk_create остаются без начала текста, и карточка
+        берёт его из полного текста в том же запросе.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.GROUP_LIST)
+        Post.objects.bulk_create(
+            Post(author=self.user, text='Пост без начала', group=self.group)
+            for _ in range(POSTS_LIMIT - 1)
+        )
+        cache.clear()
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(self.GROUP_LIST)
+        self.assertContains(response, 'Пост без начала', POSTS_LIMIT - 1)
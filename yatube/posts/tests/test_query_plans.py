@@ -0,0 +1,105 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..paginators import encode_cursor
+
+User = get_user_model()
+
+# Полные проходы по индексу, которые допустимы, с причиной.
+ALLOWED_SCANS = {
+    # Первая страница общей ленты: индекс читается по порядку до LIMIT.
+    'SCAN posts_post USING INDEX post_pub_date_idx',
+    # Число всех постов для номеров страниц, кешируется cached_count.
+    'SCAN posts_post USING COVERING INDEX post_updated_at_idx',
+    # Набор крупных авторов, кешируется в get_fan_in_authors.
+    'SCAN posts_follow USING COVERING INDEX follow_author_user_idx',
+}
+
+
+class QueryPlanTests(TestCase):
+    """Запросы страниц приложения Posts идут по индексам"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Test_group',
+            slug='test-slug',
+            description='Test_description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост #тест',
+            group=cls.group,
+        )
+        Comment.objects.create(
+            post=cls.post,
+            author=cls.reader,
+            text='Тестовый комментарий',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def get_query_plans(self, url):
+        """Возвращает план каждого SELECT-запроса, выполненного страницей"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        plans = {}
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'django_session' in sql:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plans[sql] = [row[-1] for row in cursor.fetchall()]
+
+        return plans
+
+    def test_pages_do_not_scan_tables_or_sort(self):
+        """Таблицы читаются поиском по индексу, без временного B-дерева.
+
+        Каждое обращение к таблице - шаг SEARCH; SCAN допустим, только
+        если он есть в ALLOWED_SCANS.
+        """
+        cursor = encode_cursor(self.post)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + f'?after={cursor}',
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse(
+                'posts:group_list',
+                kwargs={'slug': self.group.slug},
+            ) + f'?before={cursor}',
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse(
+                'posts:profile',
+                kwargs={'username': self.user},
+            ) + f'?after={cursor}',
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:tag_posts', kwargs={'name': 'тест'}),
+            reverse(
+                'posts:tag_posts',
+                kwargs={'name': 'тест'},
+            ) + f'?after={cursor}',
+            reverse('posts:follow_index'),
+            reverse('posts:follow_index') + f'?after={cursor}',
+            reverse('posts:follow_index') + f'?before={cursor}',
+        )
+        for url in urls:
+            for sql, plan in self.get_query_plans(url).items():
+                for step in plan:
+                    with self.subTest(url=url, sql=sql, step=step):
+                        self.assertNotIn('TEMP B-TREE', step)
+                        if step.startswith('SCAN'):
+                            self.assertIn(step, ALLOWED_SCANS)
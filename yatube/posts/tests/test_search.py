@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..constants import POSTS_LIMIT
+from ..models import Post
+from ..search import install_search_index, search_posts
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    """Проверка полнотекстового поиска по постам"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='password',
+        )
+        cls.rare = Post.objects.create(
+            author=cls.author,
+            text='Ёжик в тумане искал лошадку',
+        )
+        cls.frequent = Post.objects.create(
+            author=cls.author,
+            text='Ежик, ежик, ежик! Опять ежик в тумане',
+        )
+        cls.other = Post.objects.create(
+            author=cls.author,
+            text='Совсем другая история',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_ranked_by_relevance(self):
+        """Найденные посты идут по релевантности, ё не отличается от е"""
+        self.assertEqual(
+            list(search_posts('ЕЖИК')),
+            [self.frequent, self.rare],
+        )
+        self.assertEqual(list(search_posts('ёжик лошадку')), [self.rare])
+        self.assertEqual(list(search_posts('"; DROP')), [])
+        self.assertEqual(list(search_posts('  ,.  ')), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Триггеры держат индекс в согласии с таблицей постов"""
+        Post.objects.filter(pk=self.other.pk).update(text='Ежик нашёлся')
+        self.assertIn(self.other, search_posts('ежик'))
+        self.assertEqual(list(search_posts('история')), [])
+        Post.objects.filter(pk=self.rare.pk).delete()
+        self.assertEqual(list(search_posts('лошадку')), [])
+
+    def test_index_is_rebuilt_without_triggers(self):
+        """Пропавшие триггеры возвращаются, а индекс перестраивается"""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_update')
+        Post.objects.filter(pk=self.other.pk).update(text='Ежик нашёлся')
+        install_search_index()
+        self.assertIn(self.other, search_posts('ежик'))
+        self.assertEqual(list(search_posts('история')), [])
+
+    def test_search_page(self):
+        """Страница поиска показывает найденное и листается с запросом"""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Туман номер {number}')
+            for number in range(POSTS_LIMIT + 2)
+        )
+        response = Client().get(reverse('posts:search'), {'q': 'туман'})
+        self.assertEqual(response.context['query'], 'туман')
+        self.assertEqual(len(response.context['page_obj']), POSTS_LIMIT)
+        self.assertContains(
+            response,
+            '?q=%D1%82%D1%83%D0%BC%D0%B0%D0%BD&amp;page=2',
+        )
+        response = Client().get(
+            reverse('posts:search'),
+            {'q': 'туман', 'page': 2},
+        )
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через индекс"""
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'),
+            {'q': 'лошадку'},
+        )
+        self.assertEqual(list(response.context['cl'].result_list), [
+            self.rare,
+        ])
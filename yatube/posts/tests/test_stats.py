@@ -0,0 +1,73 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Post, UserStats
+from ..stats import get_user_stats
+
+User = get_user_model()
+
+
+class UserStatsTests(TestCase):
+    """Проверка денормализованных счётчиков пользователя"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_counts(self, user):
+        stats = UserStats.objects.get(user=user)
+
+        return (
+            stats.posts_count,
+            stats.followers_count,
+            stats.following_count,
+        )
+
+    def test_stats_row_is_counted_on_first_access(self):
+        """Первое обращение считает счётчики по исходным таблицам"""
+        self.assertFalse(UserStats.objects.exists())
+        self.assertEqual(get_user_stats(self.author).posts_count, 1)
+
+    def test_counters_follow_posts_and_follows(self):
+        """Счётчики меняются вместе с постами и подписками"""
+        get_user_stats(self.author)
+        get_user_stats(self.reader)
+        post = Post.objects.create(author=self.author, text='Второй пост')
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.author.username]),
+        )
+        self.assertEqual(self.get_counts(self.author), (2, 1, 0))
+        self.assertEqual(self.get_counts(self.reader), (0, 0, 1))
+        post.delete()
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username]),
+        )
+        self.assertEqual(self.get_counts(self.author), (1, 0, 0))
+        self.assertEqual(self.get_counts(self.reader), (0, 0, 0))
+
+    def test_profile_reads_counters_from_stats(self):
+        """Профиль показывает счётчики из UserStats"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(
+            reverse('posts:profile', args=[self.author.username]),
+        )
+        self.assertEqual(response.context['stats'].posts_count, 1)
+        self.assertEqual(response.context['stats'].followers_count, 1)
+
+    def test_recount_stats_command_repairs_drift(self):
+        """Команда recount_stats исправляет расхождение счётчиков"""
+        get_user_stats(self.author)
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        call_command('recount_stats', stdout=StringIO())
+        self.assertEqual(self.get_counts(self.author), (1, 0, 0))
@@ -0,0 +1,198 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from sorl.thumbnail import default
+
+from ..constants import MEDIA_GRACE_PERIOD
+from ..models import Post
+from ..storage import post_image_storage
+from ..thumbnails import generate_thumbnails, get_renditions
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def make_gif(name='small.gif', tail=b''):
+    return SimpleUploadedFile(
+        name=name,
+        content=SMALL_GIF + tail,
+        content_type='image/gif',
+    )
+
+
+def make_old(*paths):
+    """Файлы тронуты раньше MEDIA_GRACE_PERIOD назад"""
+    modified = time.time() - MEDIA_GRACE_PERIOD - 1
+    for path in paths:
+        os.utime(path, (modified, modified))
+
+
+def run_now(func):
+    """Замена transaction.on_commit: в TestCase коммита не бывает"""
+    func()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    """Проверка хранения картинок по хешу содержимого"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Файлы прошлых тестов остаются, а их посты откатываются.
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        cache.clear()
+
+    def create_post(self, image):
+        return Post.objects.create(
+            author=self.author,
+            text='Пост с картинкой',
+            image=image,
+        )
+
+    def test_name_is_sharded_content_hash(self):
+        """Имя файла - хеш содержимого во вложенных каталогах"""
+        post = self.create_post(make_gif('Моя Картинка.GIF'))
+        directory, shard_1, shard_2, name = post.image.name.split('/')
+        self.assertEqual(directory, 'posts')
+        self.assertTrue(name.startswith(shard_1 + shard_2))
+        self.assertTrue(name.endswith('.gif'))
+        self.assertTrue(post_image_storage.is_content_name(post.image.name))
+        self.assertFalse(post_image_storage.is_content_name('posts/a.gif'))
+
+    def test_identical_uploads_share_one_file(self):
+        """Одинаковые загрузки хранятся одним файлом"""
+        first = self.create_post(make_gif('first.gif'))
+        second = self.create_post(make_gif('second.gif'))
+        other = self.create_post(make_gif(tail=b'\0'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(directory), [
+            os.path.basename(first.image.path),
+        ])
+
+    @mock.patch('posts.images.transaction.on_commit', run_now)
+    def test_file_is_deleted_with_last_reference(self):
+        """Файл удаляется, когда на него не ссылается ни один пост"""
+        first = self.create_post(make_gif())
+        second = self.create_post(make_gif())
+        path = first.image.path
+        make_old(path)
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+
+    @mock.patch('posts.images.transaction.on_commit', run_now)
+    def test_fresh_file_is_left_to_gc_media(self):
+        """Недавно загруженный снова файл не удаляется вместе с постом"""
+        post = self.create_post(make_gif())
+        path = post.image.path
+        make_old(path)
+        self.create_post(make_gif()).delete()
+        post.delete()
+        self.assertTrue(os.path.exists(path))
+
+    @mock.patch('posts.images.transaction.on_commit', run_now)
+    def test_replaced_image_is_released(self):
+        """Заменённая картинка удаляется, если больше никому не нужна"""
+        post = self.create_post(make_gif())
+        path = post.image.path
+        make_old(path)
+        post.image = make_gif(tail=b'\0')
+        post.save()
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_rehash_media_moves_legacy_files(self):
+        """Команда переносит старые файлы и переписывает пути"""
+        legacy = []
+        for name in ('legacy_1.gif', 'legacy_2.gif'):
+            name = FileSystemStorage().save(
+                f'posts/{name}',
+                ContentFile(SMALL_GIF + b'legacy'),
+            )
+            legacy.append(name)
+            Post.objects.create(author=self.author, text=name, image=name)
+        out = StringIO()
+        call_command('rehash_media', stdout=out)
+        self.assertIn('Перенесено: 2, из них совпало с уже лежащими: 1',
+                      out.getvalue())
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertTrue(post_image_storage.is_content_name(names.pop()))
+        for name in legacy:
+            self.assertFalse(post_image_storage.exists(name))
+
+    def gc_media(self, **options):
+        out = StringIO()
+        call_command('gc_media', min_age=-60, stdout=out, **options)
+        return out.getvalue()
+
+    def test_gc_media_removes_orphans_and_their_thumbnails(self):
+        """gc_media удаляет картинки без постов, их миниатюры и ключи"""
+        kept = self.create_post(make_gif(tail=b'kept'))
+        orphan = self.create_post(make_gif(tail=b'orphan'))
+        for post in (kept, orphan):
+            generate_thumbnails(post.pk)
+        orphan_path = orphan.image.path
+        orphan.delete()
+        stray = default.storage.save('cache/stray.jpg', ContentFile(b'x'))
+        thumbnails = len(get_renditions()) + 1
+        report = self.gc_media()
+        self.assertIn(
+            f'Можно удалить: картинок 1, миниатюр {thumbnails}, '
+            'ключей kvstore',
+            report,
+        )
+        self.assertTrue(os.path.exists(orphan_path))
+        self.assertIn(
+            f'Удалено: картинок 1, миниатюр {thumbnails}',
+            self.gc_media(delete=True),
+        )
+        self.assertFalse(os.path.exists(orphan_path))
+        self.assertFalse(default.storage.exists(stray))
+        self.assertTrue(os.path.exists(kept.image.path))
+        self.assertIn(
+            'Можно удалить: картинок 0, миниатюр 0, ключей kvstore 0',
+            self.gc_media(),
+        )
+
+    def test_gc_media_skips_fresh_files(self):
+        """Недавно записанные файлы не трогаются"""
+        orphan = self.create_post(make_gif(tail=b'fresh'))
+        orphan.delete()
+        out = StringIO()
+        call_command('gc_media', delete=True, stdout=out)
+        self.assertIn('картинок 0', out.getvalue())
+        self.assertTrue(os.path.exists(orphan.image.path))
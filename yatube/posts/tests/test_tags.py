@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..constants import POSTS_LIMIT
+from ..models import Post, PostTag, Tag
+from ..tags import extract_tags
+
+User = get_user_model()
+
+
+class TagTests(TestCase):
+    """Проверка индекса хештегов и лент по ним"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def get_tags(self, post):
+        return set(PostTag.objects.filter(post=post).values_list(
+            'tag__name',
+            flat=True,
+        ))
+
+    def test_extract_tags(self):
+        """Хештеги ищутся без учёта регистра и не внутри слов и ссылок"""
+        self.assertEqual(
+            extract_tags(
+                '#Python и #python, #django_2! mail#box '
+                'http://example.com/#anchor &#39;',
+            ),
+            {'python', 'django_2'},
+        )
+
+    def test_tags_follow_create_edit_and_delete(self):
+        """Индекс обновляется при создании, правке и удалении поста"""
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Первый #пост про #котов',
+        })
+        post = Post.objects.get()
+        self.assertEqual(self.get_tags(post), {'пост', 'котов'})
+        kept = PostTag.objects.get(post=post, tag__name='котов')
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Всё ещё про #котов и #собак'},
+        )
+        self.assertEqual(self.get_tags(post), {'котов', 'собак'})
+        self.assertTrue(PostTag.objects.filter(pk=kept.pk).exists())
+        self.assertFalse(Tag.objects.filter(name='пост').exists())
+        post.delete()
+        self.assertFalse(PostTag.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+
+    def test_dead_tag_is_404(self):
+        """Тег без постов удаляется, и его лента отдаёт 404"""
+        Post.objects.create(author=self.author, text='Общий #тег')
+        post = Post.objects.create(author=self.author, text='Ещё #тег')
+        url = reverse('posts:tag_posts', kwargs={'name': 'тег'})
+        post.delete()
+        self.assertEqual(self.client.get(url).status_code, 200)
+        Post.objects.all().delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_tag_feed_is_keyset_paginated(self):
+        """Лента тега листается курсором и показывает только свои посты"""
+        for number in range(POSTS_LIMIT + 2):
+            Post.objects.create(
+                author=self.author,
+                text=f'Пост {number} #лента',
+            )
+        Post.objects.create(author=self.author, text='Без тега')
+        url = reverse('posts:tag_posts', kwargs={'name': 'Лента'})
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), POSTS_LIMIT)
+        self.assertEqual(page_obj[0].text, f'Пост {POSTS_LIMIT + 1} #лента')
+        self.assertContains(response, 'href="/tag/%D0%BB%D0%B5%D0%BD%D1%82')
+        response = self.client.get(url, {'after': page_obj.next_cursor})
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            ['Пост 1 #лента', 'Пост 0 #лента'],
+        )
+
+    def test_unknown_tag_is_404(self):
+        """Лента несуществующего тега отдаёт 404"""
+        Tag.objects.create(name='есть')
+        response = self.client.get(
+            reverse('posts:tag_posts', kwargs={'name': 'нет'}),
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,169 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..caching import get_generations
+from ..metrics import get_metrics
+from ..models import Post
+from ..templatetags.post_thumbnails import post_thumbnail
+from ..thumbnails import (generate_thumbnails, get_ready_thumbnail,
+                          get_renditions, prefetch_thumbnails)
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+PLACEHOLDER = 'alt="Изображение обрабатывается"'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    """Проверка фонового построения миниатюр"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='small.gif',
+                content=SMALL_GIF,
+                content_type='image/gif',
+            ),
+        )
+        cls.INDEX = reverse('posts:index')
+        cls.DETAIL = reverse('posts:post_detail', args=[cls.post.pk])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        """До построения миниатюры страницы показывают заглушку"""
+        for url in (self.INDEX, self.DETAIL):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, PLACEHOLDER)
+                self.assertContains(response, self.post.image_placeholder)
+        self.assertEqual(get_metrics(['thumbnails.placeholders']), {
+            'thumbnails.placeholders': 2,
+        })
+
+    def test_generated_thumbnails_replace_placeholder(self):
+        """Построенные миниатюры видны и в кеше страниц, и в кеше карточек"""
+        self.client.get(self.INDEX)
+        generate_thumbnails(self.post.pk)
+        for name in get_renditions():
+            self.assertIsNotNone(get_ready_thumbnail(self.post.image, name))
+        for url in (self.INDEX, self.DETAIL):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertNotContains(response, PLACEHOLDER)
+                self.assertContains(response, 'cache/')
+                self.assertContains(response, ' 2x"')
+
+    def test_missing_original_is_not_retried(self):
+        """Пропавший исходник не сбрасывает кеш лент и не ставится снова"""
+        post = Post.objects.create(
+            author=self.author,
+            text='Пост без файла',
+            image=SimpleUploadedFile(
+                name='gone.gif',
+                content=SMALL_GIF + b'gone',
+                content_type='image/gif',
+            ),
+        )
+        post.image.storage.delete(post.image.name)
+        generations = get_generations(['index'])
+        generate_thumbnails(post.pk)
+        self.assertEqual(get_generations(['index']), generations)
+        self.assertEqual(get_metrics(['thumbnails.generated']), {
+            'thumbnails.generated': 0,
+        })
+        with mock.patch(
+            'posts.templatetags.post_thumbnails.queue_thumbnails',
+        ) as queue:
+            self.assertIsNone(post_thumbnail(post, 'card'))
+            self.assertIsNone(post_thumbnail(self.post, 'card'))
+        queue.assert_called_once_with(self.post)
+
+    def test_page_thumbnails_are_prefetched_at_once(self):
+        """Миниатюры страницы ищутся одним запросом и читаются тегом"""
+        for number in range(3):
+            post = Post.objects.create(
+                author=self.author,
+                text=f'Пост {number}',
+                image=SimpleUploadedFile(
+                    name=f'small{number}.gif',
+                    content=SMALL_GIF + bytes([number]),
+                    content_type='image/gif',
+                ),
+            )
+            generate_thumbnails(post.pk)
+        Post.objects.create(author=self.author, text='Пост без картинки')
+        posts = list(Post.objects.all())
+        same_posts = list(Post.objects.all())
+        cache.clear()
+        with self.assertNumQueries(1):
+            prefetch_thumbnails(posts)
+        with self.assertNumQueries(0):
+            prefetch_thumbnails(same_posts)
+            for post in posts:
+                for name in get_renditions():
+                    post_thumbnail(post, name)
+        ready = [
+            None not in post.thumbnails.values()
+            for post in posts if post.image
+        ]
+        self.assertEqual(ready, [True, True, True, False])
+
+    def warm(self, **options):
+        out = StringIO()
+        call_command(
+            'warm_thumbnails',
+            workers=0,
+            stdout=out,
+            stderr=StringIO(),
+            **options,
+        )
+        return out.getvalue()
+
+    def test_warm_thumbnails_command(self):
+        """Команда строит недостающие миниатюры и пропускает готовые"""
+        Post.objects.create(
+            author=self.author,
+            text='Битая картинка',
+            image=SimpleUploadedFile(
+                name='broken.gif',
+                content=b'not an image',
+                content_type='image/gif',
+            ),
+        )
+        self.assertIn('Построено: 1, пропущено готовых: 0, ошибок: 1',
+                      self.warm())
+        self.assertIsNotNone(get_ready_thumbnail(self.post.image, 'card'))
+        self.assertIn('Построено: 0, пропущено готовых: 1, ошибок: 1',
+                      self.warm())
+        self.assertIn('Построено: 0, пропущено готовых: 0, ошибок: 0',
+                      self.warm(resume=True))
@@ -0,0 +1,161 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..constants import POSTS_LIMIT
+from ..metrics import get_metrics
+from ..models import Follow, Post, TimelineEntry
+from ..timeline import fan_out_post, get_fan_in_authors
+
+User = get_user_model()
+TEST_TIMELINE_LIMIT = 3
+
+
+class TimelineTests(TestCase):
+    """Проверка материализованной ленты подписок"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_timeline_posts(self):
+        return list(Post.objects.filter(timeline_entries__user=self.reader))
+
+    def test_follow_backfills_and_unfollow_cleans_timeline(self):
+        """Подписка добавляет старые посты автора, отписка убирает их"""
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.author.username]),
+        )
+        self.assertEqual(self.get_timeline_posts(), [self.old_post])
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username]),
+        )
+        self.assertEqual(self.get_timeline_posts(), [])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост сразу попадает в ленту подписчика"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+
+    @mock.patch('posts.timeline.TIMELINE_LIMIT', TEST_TIMELINE_LIMIT)
+    def test_timeline_length_is_bounded(self):
+        """В ленте хранится не больше TIMELINE_LIMIT последних постов"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(TEST_TIMELINE_LIMIT + 1)
+        ]
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(),
+            TEST_TIMELINE_LIMIT,
+        )
+        self.assertNotIn(self.old_post, self.get_timeline_posts())
+        self.assertIn(posts[-1], self.get_timeline_posts())
+
+    @mock.patch('posts.timeline.TIMELINE_LIMIT', TEST_TIMELINE_LIMIT)
+    def test_fan_out_queries_do_not_grow_with_followers(self):
+        """Раскладка поста - одна вставка и одна обрезка на всех подписчиков"""
+        followers = [
+            User.objects.create_user(username=f'follower_{i}')
+            for i in range(TEST_TIMELINE_LIMIT)
+        ]
+        Follow.objects.bulk_create(
+            Follow(user=follower, author=self.author)
+            for follower in followers
+        )
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(TEST_TIMELINE_LIMIT + 1)
+        ]
+        TimelineEntry.objects.all().delete()
+        get_fan_in_authors()
+        for post in posts:
+            with self.assertNumQueries(3):
+                fan_out_post(post)
+        for follower in followers:
+            with self.subTest(follower=follower.username):
+                self.assertEqual(
+                    set(Post.objects.filter(timeline_entries__user=follower)),
+                    set(posts[1:]),
+                )
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает потерянную ленту"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.get_timeline_posts(), [self.old_post])
+
+    @override_settings(POSTS_FANOUT_FOLLOWER_LIMIT=2)
+    def test_popular_author_is_merged_at_read_time(self):
+        """Посты автора выше порога подписчиков подмешиваются при чтении"""
+        other_author = User.objects.create_user(username='other_author')
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=other_author)
+        cache.clear()
+        posts = [
+            Post.objects.create(
+                author=(self.author, other_author)[i % 2],
+                text=f'Пост {i}',
+            )
+            for i in range(POSTS_LIMIT + 1)
+        ]
+        self.assertFalse(
+            TimelineEntry.objects.filter(post__in=posts[::2]).exists()
+        )
+        expected = posts[::-1] + [self.old_post]
+        first_page = self.reader_client.get(
+            reverse('posts:follow_index'),
+        ).context['page_obj']
+        second_page = self.reader_client.get(
+            reverse('posts:follow_index'),
+            {'after': first_page.next_cursor},
+        ).context['page_obj']
+        self.assertEqual(list(first_page) + list(second_page), expected)
+        feed_metrics = get_metrics()
+        self.assertEqual(feed_metrics['fanout.follower_limit'], 2)
+        self.assertGreater(feed_metrics['fanout.skipped_posts'], 0)
+        self.assertGreater(feed_metrics['follow_feed.merges'], 0)
+
+    @override_settings(POSTS_FANOUT_FOLLOWER_LIMIT=2)
+    def test_author_below_limit_gets_skipped_posts_back(self):
+        """Пропущенные посты автора, ставшего мелким, попадают в ленты"""
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=fan, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        cache.clear()
+        self.assertEqual(get_fan_in_authors(), {self.author.id})
+        post = Post.objects.create(author=self.author, text='Пропущенный')
+        self.assertNotIn(post, self.get_timeline_posts())
+        Follow.objects.filter(user=fan).delete()
+        cache.delete('fan_in_authors:2')
+        self.assertEqual(get_fan_in_authors(), set())
+        self.assertIn(post, self.get_timeline_posts())
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(post=post).values_list(
+                'user',
+                flat=True,
+            )),
+            {self.reader.id},
+        )
+        self.assertGreater(get_metrics()['fanout.backfilled_entries'], 0)
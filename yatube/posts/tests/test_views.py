@@ -1,3 +1,4 @@
+import base64
 import shutil
 import tempfile
 
@@ -6,11 +7,14 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from ..constants import POSTS_LIMIT
 from ..models import Comment, Follow, Group, Post
+from ..paginators import encode_cursor
 
 User = get_user_model()
 SECOND_PAGE_COUNT_POST = 3
@@ -152,6 +156,89 @@ class PostsPagesTests(TestCase):
                     SECOND_PAGE_COUNT_POST,
                 )
 
+    def test_keyset_pages_follow_numeric_pages(self):
+        """Курсорная пагинация отдаёт те же посты, что и по номеру"""
+        pages = (
+            self.INDEX,
+            self.GROUP_LIST,
+            self.PROFILE,
+        )
+        for page in pages:
+            with self.subTest(value=page):
+                first_page = self.authorized_client.get(page).context[
+                    'page_obj'
+                ]
+                response = self.authorized_client.get(
+                    page, {'after': first_page.next_cursor},
+                )
+                second_page = response.context['page_obj']
+                self.assertEqual(
+                    list(second_page),
+                    list(self.authorized_client.get(
+                        page, {'page': 2},
+                    ).context['page_obj']),
+                )
+                self.assertFalse(second_page.has_next())
+                response = self.authorized_client.get(
+                    page, {'before': second_page.previous_cursor},
+                )
+                self.assertEqual(
+                    list(response.context['page_obj']),
+                    list(first_page),
+                )
+
+    def test_keyset_page_with_broken_cursor(self):
+        """Битый курсор открывает первую страницу ленты"""
+        for raw in (
+            None,
+            b'2030-01-01T00:00:00+00:00|99999999999999999999999',
+            b'2030-01-01T00:00:00+00:00|-1',
+        ):
+            cursor = (
+                base64.urlsafe_b64encode(raw).decode() if raw
+                else 'not-a-cursor'
+            )
+            for direction in ('after', 'before'):
+                with self.subTest(raw=raw, direction=direction):
+                    response = self.authorized_client.get(
+                        self.INDEX, {direction: cursor},
+                    )
+                    page_obj = response.context['page_obj']
+                    self.assertEqual(len(page_obj), POSTS_LIMIT)
+                    self.assertFalse(page_obj.has_previous())
+
+    def test_far_page_numbers_open_first_page(self):
+        """Без подсчёта записей дальние номера страниц не идут в базу"""
+        Follow.objects.create(user=self.user_0, author=self.user)
+        for url, params in (
+            (self.FOLLOW, {}),
+            (reverse('posts:search'), {'q': 'Тестовый'}),
+        ):
+            # Первый запрос ещё ищет миниатюры в kvstore, а не в кеше.
+            self.logined_client.get(url, params)
+            with CaptureQueriesContext(connection) as first_page:
+                self.logined_client.get(url, {**params, 'page': 1})
+            for number in (10 ** 6, 10 ** 23):
+                with self.subTest(url=url, number=number):
+                    with self.assertNumQueries(len(first_page)):
+                        response = self.logined_client.get(
+                            url, {**params, 'page': number},
+                        )
+                    page_obj = response.context['page_obj']
+                    self.assertEqual(page_obj.number, 1)
+                    self.assertEqual(len(page_obj), POSTS_LIMIT)
+
+    def test_keyset_page_after_last_post(self):
+        """Курсор после последнего поста открывает первую страницу ленты"""
+        last_page = self.authorized_client.get(
+            self.INDEX, {'page': 2},
+        ).context['page_obj']
+        response = self.authorized_client.get(
+            self.INDEX, {'after': encode_cursor(last_page[-1])},
+        )
+        self.assertEqual(len(response.context['page_obj']), POSTS_LIMIT)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
     def test_group_page_show_correct_context(self):
         """Шаблон group_list.html сформирован с правильным контекстом."""
         response = self.authorized_client.get(self.GROUP_LIST)
@@ -186,6 +273,32 @@ class PostsPagesTests(TestCase):
         )
         self.assertIn(response.context['following'], [True, False])
 
+    def test_post_detail_query_budget(self):
+        """Страница поста строится без запросов на каждый комментарий"""
+        for number in range(3):
+            Comment.objects.create(
+                text='Комментарий',
+                author=User.objects.create_user(username=f'reader{number}'),
+                post=self.posts[0],
+            )
+        Follow.objects.create(user=self.user_0, author=self.user)
+        # Первый просмотр создаёт строку счётчиков автора.
+        self.client.get(self.DETAIL)
+        # Гость: области кеша (одни на ETag и ключ кеша), время правки,
+        # пост с автором, группой и счётчиками, миниатюры из kvstore
+        # после очистки кеша, комментарии.
+        cache.clear()
+        with self.assertNumQueries(5):
+            self.client.get(self.DETAIL)
+        # Пользователь: ещё сессия, сам пользователь и подписка, но без
+        # времени правки: Last-Modified ему не отдаётся. Подписку,
+        # узнанную для ETag, берёт и кнопка.
+        cache.clear()
+        with self.assertNumQueries(7):
+            response = self.logined_client.get(self.DETAIL)
+        self.assertContains(response, 'Отписаться')
+        self.assertContains(response, 'Подписавшихся на автора: 1')
+
     def test_create_post_page_show_correct_context(self):
         """Шаблон create_post сформирован с правильным контекстом."""
         response = self.authorized_client.get(self.CREATE)
@@ -262,15 +375,43 @@ class PostsPagesTests(TestCase):
             text='post for test cache',
         )
         content_index = self.client.get(self.INDEX).content
-        post.delete()
-        content_index_after_delete = self.client.get(self.INDEX).content
-        self.assertEqual(content_index, content_index_after_delete)
+        Post.objects.filter(pk=post.pk).update(
+            text='changed without signals',
+            excerpt='changed without signals',
+        )
+        content_index_after_update = self.client.get(self.INDEX).content
+        self.assertEqual(content_index, content_index_after_update)
         cache.clear()
         content_index_after_cache_clear = self.client.get(self.INDEX).content
         self.assertNotEqual(
             content_index_after_cache_clear,
-            content_index_after_delete,
+            content_index_after_update,
+        )
+
+    def test_cache_of_feeds_is_invalidated_by_changes(self):
+        """Новый и удалённый пост сразу видны в закешированных лентах"""
+        pages = (
+            self.INDEX,
+            self.GROUP_LIST,
+            self.PROFILE,
         )
+        for page in pages:
+            with self.subTest(value=page):
+                self.client.get(page)
+                post = Post.objects.create(
+                    author=self.user,
+                    group=self.group,
+                    text='post for test cache',
+                )
+                self.assertEqual(
+                    self.client.get(page).context['page_obj'][0],
+                    post,
+                )
+                post.delete()
+                self.assertNotIn(
+                    post,
+                    self.client.get(page).context['page_obj'],
+                )
 
     def test_following_for_users(self):
         """Авторизованый пользователь создаёт подписку"""
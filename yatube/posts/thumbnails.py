@@ -0,0 +1,249 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import metrics
+from .caching import bump_generations, get_post_scopes
+from .constants import (IMAGE_QUALITY, POST_THUMBNAILS,
+                        THUMBNAIL_RETRY_TIMEOUT, THUMBNAIL_WORKERS)
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+metrics.register(
+    'thumbnails.queued',
+    'thumbnails.generated',
+    'thumbnails.failed',
+    'thumbnails.placeholders',
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+class LookupBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, который умеет только искать миниатюры"""
+
+    def get_thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры с теми же именем и опциями, что у get_thumbnail.
+
+        Ни исходник, ни хранилище, ни kvstore не читаются.
+        """
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+
+        return ImageFile(name, default.storage)
+
+
+lookup_backend = LookupBackend()
+
+
+def get_renditions():
+    """Все миниатюры поста: {имя: (геометрия, опции sorl)}.
+
+    К каждой миниатюре из POST_THUMBNAILS добавляется вариант в WebP
+    с суффиксом _webp, если Pillow собран с его поддержкой.
+    """
+    renditions = {
+        name: (geometry, {'quality': IMAGE_QUALITY, **options})
+        for name, (geometry, options) in POST_THUMBNAILS.items()
+    }
+    if features.check('webp'):
+        renditions.update({
+            f'{name}_webp': (geometry, {**options, 'format': 'WEBP'})
+            for name, (geometry, options) in renditions.items()
+        })
+
+    return renditions
+
+
+def get_thumbnail_file(image, name):
+    geometry, options = get_renditions()[name]
+
+    return lookup_backend.get_thumbnail_file(image, geometry, **options)
+
+
+def get_ready_thumbnail(image, name):
+    """Миниатюра из kvstore или None, если её ещё не построили"""
+    return default.kvstore.get(get_thumbnail_file(image, name))
+
+
+def prefetch_thumbnails(posts):
+    """Ищет готовые миниатюры всех постов сразу.
+
+    Вместо отдельного обращения к kvstore на каждый пост делается один
+    cache.get_many и, для ключей не из кеша, один запрос к базе. Найденное
+    кладётся в post.thumbnails по именам, отсутствующее - как None.
+    С kvstore другого типа ничего не делает: тег поищет сам.
+    """
+    if not isinstance(default.kvstore, cached_db_kvstore.KVStore):
+        return
+    lookups = {}
+    for post in posts:
+        post.thumbnails = {}
+        if not post.image:
+            continue
+        for name in get_renditions():
+            thumbnail = get_thumbnail_file(post.image, name)
+            lookups[add_prefix(thumbnail.key)] = (post, name)
+    if not lookups:
+        return
+    kv_cache = default.kvstore.cache
+    empty = cached_db_kvstore.EMPTY_VALUE
+    values = kv_cache.get_many(list(lookups))
+    missing = [key for key in lookups if key not in values]
+    if missing:
+        rows = dict(KVStoreModel.objects.filter(
+            key__in=missing,
+        ).values_list('key', 'value'))
+        found = {key: rows.get(key, empty) for key in missing}
+        kv_cache.set_many(found, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(found)
+    for key, (post, name) in lookups.items():
+        value = values[key]
+        post.thumbnails[name] = (
+            None if value == empty else deserialize_image_file(value)
+        )
+
+
+def get_workers():
+    """Число потоков пула; 0 - строить миниатюры прямо в запросе"""
+    return getattr(settings, 'POSTS_THUMBNAIL_WORKERS', THUMBNAIL_WORKERS)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_workers(),
+                thread_name_prefix='thumbnails',
+            )
+
+    return _executor
+
+
+def _failed_key(image):
+    return f'thumbnail_failed:{image.name}'
+
+
+def has_failed(image):
+    """Миниатюры картинки недавно не удалось построить"""
+    return cache.get(_failed_key(image)) is not None
+
+
+def build_renditions(image):
+    """Строит недостающие миниатюры картинки.
+
+    Возвращает число новых миниатюр в kvstore и признак того, что
+    все миниатюры готовы. Нечитаемый исходник sorl только логирует,
+    поэтому готовность проверяется по kvstore.
+    """
+    built = 0
+    for name, (geometry, options) in get_renditions().items():
+        if get_ready_thumbnail(image, name) is not None:
+            continue
+        try:
+            get_thumbnail(image, geometry, **options)
+        except Exception:
+            logger.exception('Не удалось построить миниатюру %s', name)
+        if get_ready_thumbnail(image, name) is None:
+            return built, False
+        built += 1
+
+    return built, True
+
+
+def generate_thumbnails(post_id):
+    """Строит все миниатюры поста и сбрасывает кеш лент с ним.
+
+    Кеш лент сбрасывается, только если в kvstore появились новые
+    миниатюры. Неудача запоминается на THUMBNAIL_RETRY_TIMEOUT: тег
+    не ставит пост в очередь при каждом показе.
+    """
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id,
+    ).first()
+    if post is None or not post.image:
+        return
+    built, ready = build_renditions(post.image)
+    if not ready:
+        metrics.incr('thumbnails.failed')
+        cache.set(_failed_key(post.image), 1, THUMBNAIL_RETRY_TIMEOUT)
+    if built:
+        metrics.incr('thumbnails.generated')
+        bump_generations(*get_post_scopes(post))
+
+
+def warm_image(image):
+    """Строит все миниатюры картинки; для пула процессов warm_thumbnails.
+
+    Возвращает имя картинки и текст ошибки или None.
+    """
+    source = ImageFile(image, Post._meta.get_field('image').storage)
+    try:
+        for name, (geometry, options) in get_renditions().items():
+            get_thumbnail(source, geometry, **options)
+            # Нечитаемый исходник sorl только логирует, а в kvstore
+            # миниатюра тогда не попадает.
+            if get_ready_thumbnail(source, name) is None:
+                return image, f'не удалось построить {name}'
+    except Exception as error:
+        return image, f'{type(error).__name__}: {error}'
+
+    return image, None
+
+
+def _run(post_id):
+    try:
+        generate_thumbnails(post_id)
+    except Exception:
+        metrics.incr('thumbnails.failed')
+        logger.exception('Не удалось построить миниатюры поста %s', post_id)
+    finally:
+        _pending.discard(post_id)
+        connections.close_all()
+
+
+def queue_thumbnails(post):
+    """Ставит построение миниатюр поста в пул после коммита.
+
+    Пост, который уже ждёт в очереди, повторно не ставится.
+    """
+    if not post.image:
+        return
+    post_id = post.pk
+
+    def submit():
+        if not get_workers():
+            generate_thumbnails(post_id)
+            return
+        if post_id in _pending:
+            return
+        _pending.add(post_id)
+        metrics.incr('thumbnails.queued')
+        _get_executor().submit(_run, post_id)
+
+    transaction.on_commit(submit)
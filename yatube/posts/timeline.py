@@ -0,0 +1,312 @@
+import heapq
+import time
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, F, Subquery
+from django.utils import timezone
+
+from . import metrics
+from .constants import (FANOUT_AUTHORS_TIMEOUT, FANOUT_FOLLOWER_LIMIT,
+                        FEED_ORDERING, TIMELINE_LIMIT)
+from .models import Follow, Post, TimelineEntry
+
+TIMELINE_KEY = ('timeline_pub_date', 'timeline_post_id')
+
+metrics.register(
+    'fanout.follower_limit',
+    'fanout.posts',
+    'fanout.skipped_posts',
+    'fanout.entries',
+    'fanout.backfilled_entries',
+    'follow_feed.merges',
+    'follow_feed.merged_authors',
+    'follow_feed.merged_rows',
+    'follow_feed.merge_us',
+)
+
+
+class MergedFeed:
+    """Лента, слитая из нескольких упорядоченных запросов постов.
+
+    Каждый источник отдаёт не больше stop первых строк по своему индексу,
+    а слияние идёт в памяти, поэтому страница стоит столько же, сколько
+    несколько коротких индексных выборок. Поддерживает то подмножество
+    API QuerySet, которым пользуются пагинаторы.
+    """
+
+    ordered = True
+
+    def __init__(self, sources, descending=True):
+        self.sources = sources
+        self.descending = descending
+
+    def _clone(self, sources, descending=None):
+        if descending is None:
+            descending = self.descending
+
+        return MergedFeed(sources, descending)
+
+    def filter(self, *args, **kwargs):
+        return self._clone([
+            source.filter(*args, **kwargs) for source in self.sources
+        ])
+
+    def select_related(self, *fields):
+        return self._clone([
+            source.select_related(*fields) for source in self.sources
+        ])
+
+    def only(self, *fields):
+        return self._clone([source.only(*fields) for source in self.sources])
+
+    def annotate(self, **annotations):
+        return self._clone([
+            source.annotate(**annotations) for source in self.sources
+        ])
+
+    def order_by(self, *fields):
+        return self._clone(
+            [source.order_by(*fields) for source in self.sources],
+            descending=fields[0].startswith('-'),
+        )
+
+    def reverse(self):
+        return self._clone(
+            [source.reverse() for source in self.sources],
+            descending=not self.descending,
+        )
+
+    def count(self):
+        return sum(source.count() for source in self.sources)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+
+        started = time.monotonic()
+        rows = [list(source[:index.stop]) for source in self.sources]
+        merged = heapq.merge(
+            *rows,
+            key=attrgetter('pub_date', 'id'),
+            reverse=self.descending,
+        )
+        page = list(islice(merged, index.start or 0, index.stop))
+        metrics.incr('follow_feed.merges')
+        metrics.incr('follow_feed.merged_authors', len(self.sources) - 1)
+        metrics.incr('follow_feed.merged_rows', sum(map(len, rows)))
+        metrics.incr(
+            'follow_feed.merge_us',
+            int((time.monotonic() - started) * 1000000),
+        )
+
+        return page
+
+
+def get_fanout_limit():
+    """Порог подписчиков, начиная с которого посты не раскладываются"""
+    return getattr(
+        settings,
+        'POSTS_FANOUT_FOLLOWER_LIMIT',
+        FANOUT_FOLLOWER_LIMIT,
+    )
+
+
+def get_fan_in_authors():
+    """Авторы, чьи посты подмешиваются в ленты при чтении.
+
+    Набор кешируется на FANOUT_AUTHORS_TIMEOUT: и запись, и чтение
+    ленты должны видеть одних и тех же авторов. Рядом без срока
+    хранится, с какого времени автор в наборе: опустившись ниже
+    порога, он возвращает в ленты посты, пропущенные с этого времени.
+    """
+    limit = get_fanout_limit()
+    metrics.gauge('fanout.follower_limit', limit)
+    authors = cache.get(f'fan_in_authors:{limit}')
+    if authors is None:
+        authors = set(
+            Follow.objects.values('author').annotate(
+                followers=Count('user'),
+            ).filter(
+                followers__gte=limit,
+            ).values_list('author', flat=True)
+        )
+        since = cache.get(f'fan_in_since:{limit}', {})
+        for author_id in since.keys() - authors:
+            backfill_skipped_posts(author_id, since[author_id])
+        now = timezone.now()
+        cache.set(
+            f'fan_in_since:{limit}',
+            {author_id: since.get(author_id, now) for author_id in authors},
+            None,
+        )
+        cache.set(f'fan_in_authors:{limit}', authors, FANOUT_AUTHORS_TIMEOUT)
+
+    return authors
+
+
+def get_timeline(user):
+    """Лента подписок: материализованная лента и посты крупных авторов.
+
+    Записи ленты сортируются и сравниваются с курсором по своим
+    pub_date и post_id из TIMELINE_KEY: тогда страница читается по
+    индексу ленты пользователя, без сортировки во временном B-дереве.
+    Посты крупных авторов получают те же поля из своих колонок.
+    """
+    timeline = Post.objects.filter(timeline_entries__user=user).annotate(
+        timeline_pub_date=F('timeline_entries__pub_date'),
+        timeline_post_id=F('timeline_entries__post'),
+    )
+    fan_in_authors = get_fan_in_authors().intersection(
+        Follow.objects.filter(user=user).values_list('author_id', flat=True)
+    )
+    if not fan_in_authors:
+        return timeline
+
+    return MergedFeed(
+        [timeline.exclude(author_id__in=fan_in_authors)]
+        + [
+            Post.objects.filter(author_id=author_id).annotate(
+                timeline_pub_date=F('pub_date'),
+                timeline_post_id=F('id'),
+            )
+            for author_id in sorted(fan_in_authors)
+        ]
+    )
+
+
+def trim_timeline(user_id):
+    """Оставляет в ленте пользователя не больше TIMELINE_LIMIT записей"""
+    cutoff = TimelineEntry.objects.filter(user_id=user_id).values(
+        'pub_date',
+    )[TIMELINE_LIMIT:TIMELINE_LIMIT + 1]
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        pub_date__lte=Subquery(cutoff),
+    ).delete()
+
+
+def trim_follower_timelines(author_id):
+    """Одним запросом обрезает ленты всех подписчиков автора"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            DELETE FROM {TimelineEntry._meta.db_table} WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY user_id
+                        ORDER BY pub_date DESC, post_id DESC
+                    ) AS position
+                    FROM {TimelineEntry._meta.db_table}
+                    WHERE user_id IN (
+                        SELECT user_id FROM {Follow._meta.db_table}
+                        WHERE author_id = %s
+                    )
+                )
+                WHERE position > %s
+            )
+            """,
+            [author_id, TIMELINE_LIMIT],
+        )
+
+
+def add_to_timeline(user_id, posts):
+    """Добавляет посты вида (id, pub_date) в ленту пользователя"""
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+    trim_timeline(user_id)
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора"""
+    metrics.incr('fanout.posts')
+    if post.author_id in get_fan_in_authors():
+        metrics.incr('fanout.skipped_posts')
+        return
+
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id',
+        flat=True,
+    )
+    entries = TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ],
+        ignore_conflicts=True,
+    )
+    trim_follower_timelines(post.author_id)
+    metrics.incr('fanout.entries', len(entries))
+
+
+def backfill_skipped_posts(author_id, since):
+    """Раскладывает посты автора, пропущенные, пока он был крупным"""
+    posts = list(
+        Post.objects.filter(
+            author_id=author_id,
+            pub_date__gte=since,
+        ).order_by(
+            *FEED_ORDERING,
+        ).values_list('id', 'pub_date')[:TIMELINE_LIMIT]
+    )
+    if not posts:
+        return
+
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id',
+        flat=True,
+    )
+    entries = TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for user_id in followers
+            for post_id, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+    trim_follower_timelines(author_id)
+    metrics.incr('fanout.backfilled_entries', len(entries))
+
+
+def backfill_author(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки"""
+    if author_id in get_fan_in_authors():
+        return
+
+    add_to_timeline(
+        user_id,
+        Post.objects.filter(author_id=author_id).order_by(
+            *FEED_ORDERING,
+        ).values_list('id', 'pub_date')[:TIMELINE_LIMIT],
+    )
+
+
+def remove_author(user_id, author_id):
+    """Убирает из ленты посты автора после отписки"""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id,
+    ).delete()
+
+
+def rebuild_timeline(user_id):
+    """Пересобирает ленту пользователя с нуля по его подпискам"""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    add_to_timeline(
+        user_id,
+        Post.objects.filter(
+            author__following__user_id=user_id,
+        ).exclude(
+            author_id__in=get_fan_in_authors(),
+        ).order_by(
+            *FEED_ORDERING,
+        ).values_list('id', 'pub_date')[:TIMELINE_LIMIT],
+    )
@@ -22,5 +22,8 @@ urlpatterns = [
         name='profile_unfollow',
     ),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('search/', views.search, name='search'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
+    path('tag/<str:name>/', views.tag_posts, name='tag_posts'),
     path('', views.index, name='index'),
 ]
@@ -1,12 +1,101 @@
-from django.core.paginator import Paginator
+from django.db.models import Case, F, When
+from django.db.models.functions import Substr
 
-from .constants import POSTS_LIMIT
+from .constants import (FEED_KEY, POST_CARD_FIELDS, POST_EXCERPT_LENGTH,
+                        POSTS_LIMIT)
+from .paginators import (KeysetPaginator, WindowedPaginator, encode_cursor,
+                         get_ordering)
+from .thumbnails import prefetch_thumbnails
 
 
-def get_ten_posts_per_page(request, post_list):
-    """Функция-утилита для Пагинации страниц"""
-    paginator = Paginator(post_list, POSTS_LIMIT)
+def get_ten_posts_per_page(
+    request,
+    post_list,
+    count=None,
+    ranked=False,
+    key=FEED_KEY,
+    max_pages=None,
+):
+    """Функция-утилита для Пагинации страниц.
+
+    С параметрами after/before страница строится по курсору, иначе по
+    номеру из page; ссылка на следующую страницу всегда курсорная.
+    count - число записей или функция, которая его возвращает; без него
+    записи не считаются. ranked - записи уже упорядочены, например по
+    релевантности поиска: тогда порядок не меняется, а страницы идут
+    только по номерам. key - поля сортировки и курсора, как у
+    KeysetPaginator. max_pages - наибольший номер страницы для лент
+    без count, как у WindowedPaginator. Миниатюры постов страницы
+    ищутся сразу для всей страницы.
+    """
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if (after or before) and not ranked:
+        page_obj = KeysetPaginator(
+            post_list,
+            POSTS_LIMIT,
+            key=key,
+        ).get_keyset_page(
+            after=after,
+            before=before,
+        )
+        prefetch_thumbnails(page_obj)
+
+        return page_obj
+
+    paginator = WindowedPaginator(
+        post_list if ranked else post_list.order_by(*get_ordering(key)),
+        POSTS_LIMIT,
+        count=count,
+        max_pages=max_pages,
+    )
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    page_obj.next_cursor = (
+        encode_cursor(page_obj[-1])
+        if page_obj.has_next() and not ranked else ''
+    )
+    prefetch_thumbnails(page_obj)
 
     return page_obj
+
+
+def make_excerpt(text, length=POST_EXCERPT_LENGTH):
+    """Начало текста не длиннее length символов, обрезанное по слову"""
+    if len(text) <= length:
+        return text
+    cut = text[:length]
+    if not text[length].isspace():
+        # Оборванное слово отбрасывается, если оно не единственное.
+        head, *tail = cut.rsplit(None, 1)
+        if tail:
+            cut = head
+
+    return f'{cut.rstrip()}…'
+
+
+def select_card_fields(post_list, prefix='', extra=()):
+    """Выборка только тех колонок поста, автора и группы, что нужны карточке.
+
+    Без проекции select_related тянет в каждую строку хеш пароля и почту
+    автора, описание группы и полный текст поста. prefix - путь к посту,
+    если выборка идёт по другой модели, например 'post__', extra - поля
+    этой модели, которые тоже нужны.
+
+    Текст карточки приходит в card_excerpt: начало поста, а у строк,
+    записанных мимо сигнала pre_save (bulk_create, update), - начало
+    текста, обрезанное в том же запросе.
+    """
+    return post_list.select_related(
+        f'{prefix}author',
+        f'{prefix}group',
+    ).only(
+        *extra,
+        *(f'{prefix}{field}' for field in POST_CARD_FIELDS),
+    ).annotate(card_excerpt=Case(
+        When(
+            **{f'{prefix}excerpt': ''},
+            then=Substr(f'{prefix}text', 1, POST_EXCERPT_LENGTH),
+        ),
+        default=F(f'{prefix}excerpt'),
+    ))
@@ -1,76 +1,132 @@
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from .autocomplete import get_suggestions
+from .caching import cache_feed
+from .constants import (AUTOCOMPLETE_QUERY_LENGTH, POSTS_LIMIT,
+                        SEARCH_MAX_PAGES, TIMELINE_LIMIT)
+from .conditional import (conditional_feed, get_post_last_modified,
+                          get_posts_last_modified)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import get_ten_posts_per_page
+from .models import Follow, Group, Post, PostTag, Tag, User
+from .paginators import KeysetPaginator, cached_count
+from .search import search_posts
+from .stats import get_user_stats
+from .thumbnails import prefetch_thumbnails
+from .timeline import TIMELINE_KEY, get_timeline
+from .utils import get_ten_posts_per_page, select_card_fields
 
 
-@cache_page(20, key_prefix='index_page')
+@conditional_feed(lambda: ('index',), get_posts_last_modified)
+@cache_feed(lambda: ('index',))
 def index(request):
     """Вью-функция главной страницы"""
     template = 'posts/index.html'
-    post_list = Post.objects.select_related('group', 'author')
+    post_list = select_card_fields(Post.objects.all())
     context = {
-        'page_obj': get_ten_posts_per_page(request, post_list),
+        'page_obj': get_ten_posts_per_page(
+            request,
+            post_list,
+            count=cached_count(Post.objects.all(), 'index'),
+        ),
     }
 
     return render(request, template, context)
 
 
+@conditional_feed(
+    lambda slug: (f'group:{slug}',),
+    lambda slug: get_posts_last_modified(group__slug=slug),
+)
+@cache_feed(lambda slug: (f'group:{slug}',))
 def group_posts(request, slug):
     """Вью-функция страниц сообществ"""
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.select_related('group', 'author')
+    post_list = select_card_fields(group.posts.all())
     context = {
         'group': group,
-        'page_obj': get_ten_posts_per_page(request, post_list),
+        'page_obj': get_ten_posts_per_page(
+            request,
+            post_list,
+            count=cached_count(group.posts.all(), f'group:{slug}'),
+        ),
     }
 
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_feed(
+    lambda username: (f'profile:{username}',),
+    lambda username: get_posts_last_modified(author__username=username),
+    follow_author=True,
+)
+@cache_feed(lambda username: (f'profile:{username}',))
 def profile(request, username):
     """Вью-функция просмотра профиля пользователя с публикациями"""
     author = get_object_or_404(
-        User.objects.select_related(),
+        User.objects.select_related('stats'),
         username=username,
     )
-    post_list = author.posts.all()
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user,
-        author=author,
-    ).exists()
+    stats = get_user_stats(author)
+    post_list = select_card_fields(author.posts.all())
     context = {
-        'page_obj': get_ten_posts_per_page(request, post_list),
+        'page_obj': get_ten_posts_per_page(
+            request,
+            post_list,
+            count=stats.posts_count,
+        ),
         'author': author,
-        'following': following,
+        'stats': stats,
     }
 
     return render(request, 'posts/profile.html', context)
 
 
+def get_post_detail_scopes(post_id):
+    """Области кеша страницы поста: сам пост и профиль его автора"""
+    username = Post.objects.filter(pk=post_id).values_list(
+        'author__username',
+        flat=True,
+    ).first()
+
+    return (f'post:{post_id}', f'profile:{username}')
+
+
+@conditional_feed(
+    get_post_detail_scopes,
+    get_post_last_modified,
+    follow_author=True,
+)
+@cache_feed(get_post_detail_scopes)
 def post_detail(request, post_id):
-    """Вью-функция просмотра отдельной публикации"""
-    post = get_object_or_404(Post, id=post_id)
-    form = CommentForm(request.POST or None)
-    comments = post.comments.select_related('post', 'author')
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user,
-        author=post.author,
-    ).exists()
+    """Вью-функция просмотра отдельной публикации.
+
+    Пост, автор, группа и счётчики автора приходят одним запросом,
+    комментарии с авторами - вторым. Миниатюры картинки, которых нет
+    в кеше, ищутся в kvstore ещё одним. Подписку на автора кнопка
+    берёт у ETag.
+    """
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        id=post_id,
+    )
+    prefetch_thumbnails([post])
+    comments = post.comments.select_related('author')
     context = {
         'post': post,
-        'form': form,
+        'stats': get_user_stats(post.author),
         'comments': comments,
-        'following': following,
     }
 
     return render(request, 'posts/post_detail.html', context)
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     """Вью-функция страницы создания публикации"""
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -127,16 +183,81 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     """Вью-функция страницы с постами на подписки"""
-    posts_list = Post.objects.filter(author__following__user=request.user)
+    posts_list = select_card_fields(get_timeline(request.user))
     context = {
         'user': request.user,
-        'page_obj': get_ten_posts_per_page(request, posts_list),
+        'page_obj': get_ten_posts_per_page(
+            request,
+            posts_list,
+            key=TIMELINE_KEY,
+            max_pages=TIMELINE_LIMIT // POSTS_LIMIT,
+        ),
     }
 
     return render(request, 'posts/follow.html', context)
 
 
+def search(request):
+    """Вью-функция поиска по текстам публикаций"""
+    query = request.GET.get('q', '').strip()
+    post_list = select_card_fields(search_posts(query))
+    context = {
+        'query': query,
+        'page_params': f'{urlencode({"q": query})}&',
+        'page_obj': get_ten_posts_per_page(
+            request,
+            post_list,
+            ranked=True,
+            max_pages=SEARCH_MAX_PAGES,
+        ),
+    }
+
+    return render(request, 'posts/search.html', context)
+
+
+def autocomplete(request):
+    """Вью-функция подсказок профилей и групп по началу имени.
+
+    Отвечает из индекса в памяти процесса, не обращаясь к базе.
+    """
+    query = request.GET.get('q', '')[:AUTOCOMPLETE_QUERY_LENGTH]
+    context = {
+        'results': get_suggestions(query),
+    }
+
+    return JsonResponse(context)
+
+
+def tag_posts(request, name):
+    """Вью-функция ленты публикаций с хештегом.
+
+    Страница - один проход по индексу (тег, дата) таблицы PostTag от
+    курсора, с постами, авторами и группами в том же запросе.
+    """
+    tag = get_object_or_404(Tag, name=name.lower())
+    entries = select_card_fields(
+        PostTag.objects.filter(tag=tag),
+        prefix='post__',
+        extra=('post', 'pub_date'),
+    )
+    page_obj = KeysetPaginator(entries, POSTS_LIMIT).get_keyset_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    for entry in page_obj.object_list:
+        entry.post.card_excerpt = entry.card_excerpt
+    page_obj.object_list = [entry.post for entry in page_obj.object_list]
+    prefetch_thumbnails(page_obj)
+    context = {
+        'tag': tag,
+        'page_obj': page_obj,
+    }
+
+    return render(request, 'posts/tag_posts.html', context)
+
+
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     """Вью функция для создания подписки"""
     author = get_object_or_404(User, username=username)
@@ -152,6 +273,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     """Вью функция для удаления подписки"""
     author = get_object_or_404(User, username=username)
@@ -118,9 +118,20 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Каталог общего кеша процессов одной установки; тесты берут свой.
+CACHE_DIR = os.environ.get('YATUBE_CACHE_DIR', os.path.join(BASE_DIR, 'cache'))
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.backends.tiered.TieredCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'CULL_INTERVAL': 100,
+            'L1_MAX_BYTES': 16 * 1024 * 1024,
+            'SYNC_INTERVAL': 1,
+            'STATS_DIR': os.path.join(CACHE_DIR, 'stats'),
+        },
     }
 }
 
@@ -154,5 +165,15 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Пул потоков, строящий миниатюры постов. Тесты ставят 0 через
+# core.test_runner: там миниатюры строятся сразу после коммита.
+POSTS_THUMBNAIL_WORKERS = 2
+
+# Как часто процесс переносит свои счётчики posts.metrics в общий кеш.
+# Тесты ставят 0: там счётчики пишутся сразу.
+POSTS_METRICS_FLUSH_INTERVAL = 10